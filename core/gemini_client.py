@@ -8,15 +8,41 @@ import time
 from google import genai
 from google.genai import types
 from .utils import safe_print
+from .llm_cache import cached
 
 # 长请求超时（毫秒），避免热点聚焦/合并等长 prompt 触发 SDK 默认约 60s 超时
 HTTP_TIMEOUT_MS = 300000  # 5 分钟
 
+# Deep Research 轮询间隔：从 2 秒起按 1.5 倍递增，上限 20 秒（短任务更快返回，长任务减少无效请求）
+POLL_INITIAL_DELAY_SEC = 2.0
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_DELAY_SEC = 20.0
+# 迭代次数无变化时，状态心跳日志的最小间隔（秒），减少三线程并行时的日志量与 stdout 锁竞争
+POLL_STATUS_LOG_INTERVAL_SEC = 60.0
+
+
+def _extract_text(interaction):
+    """
+    从 interaction.outputs 中取结果文本：优先第一个 type 为 text 或带 text 属性的输出，
+    否则取最后一个输出；无输出时返回 str(interaction)。
+    """
+    outputs = interaction.outputs
+    if not outputs:
+        return str(interaction)
+    for output in outputs:
+        if getattr(output, "type", None) == "text" or hasattr(output, "text"):
+            break
+    else:
+        output = outputs[-1]
+    return output.text if hasattr(output, "text") else str(output)
+
 
 class GeminiClient:
     """Gemini API 客户端封装类"""
+
+    cache_provider = "gemini"
     
-    def __init__(self, api_key, agent=None, model=None):
+    def __init__(self, api_key, agent=None, model=None, use_cache=False):
         """
         初始化客户端
         
@@ -24,18 +50,23 @@ class GeminiClient:
             api_key: API Key
             agent: Deep Research Agent 名称（可选）
             model: 模型名称（可选）
+            use_cache: 是否启用 LLM 结果落盘缓存（见 core.llm_cache）
         """
         self.api_key = api_key
         self.agent = agent or "deep-research-pro-preview-12-2025"
         self.model = model or "gemini-3-pro-preview"
+        self.use_cache = use_cache
         self.client = genai.Client(
             api_key=api_key,
             http_options=types.HttpOptions(timeout=HTTP_TIMEOUT_MS),
         )
     
+    @cached("agent")
     def call_deep_research(self, prompt, domain_name):
         """
         调用 Deep Research Agent 进行研究
+        可在多线程中并发调用：ResearchPipeline.stage1_research_parallel 以线程池同时
+        跑 E/S/G 三个领域（各用独立 client），日志统一经加锁的 safe_print 输出。
         
         Args:
             prompt: 研究提示词
@@ -59,6 +90,8 @@ class GeminiClient:
             # 轮询结果
             poll_count = 0
             last_step_count = 0
+            poll_delay = POLL_INITIAL_DELAY_SEC
+            last_log_time = time.monotonic()
             
             while True:
                 poll_count += 1
@@ -75,11 +108,14 @@ class GeminiClient:
                     if isinstance(interaction.metadata, dict):
                         current_step_count = interaction.metadata.get('step_count') or interaction.metadata.get('steps')
                 
-                # 记录迭代次数变化
+                # 记录迭代次数变化；无变化时按时间间隔打印心跳
+                now = time.monotonic()
                 if current_step_count is not None and current_step_count != last_step_count:
                     last_step_count = current_step_count
+                    last_log_time = now
                     safe_print(f"[{domain_name}] [轮询 {poll_count}] 迭代次数: {current_step_count}, 状态: {status}")
-                elif poll_count % 3 == 0:  # 每3次轮询打印一次状态
+                elif now - last_log_time >= POLL_STATUS_LOG_INTERVAL_SEC:
+                    last_log_time = now
                     if current_step_count is not None:
                         safe_print(f"[{domain_name}] [轮询 {poll_count}] 迭代次数: {current_step_count}, 状态: {status}")
                     else:
@@ -93,30 +129,7 @@ class GeminiClient:
                         safe_print(f"[{domain_name}] [完成] 研究完成！")
                     
                     # 获取最终报告
-                    result = None
-                    if interaction.outputs and len(interaction.outputs) > 0:
-                        text_output = None
-                        for output in interaction.outputs:
-                            if hasattr(output, 'type') and output.type == "text":
-                                text_output = output
-                                break
-                            elif hasattr(output, 'text'):
-                                text_output = output
-                                break
-                        
-                        if text_output:
-                            if hasattr(text_output, 'text'):
-                                result = text_output.text
-                            else:
-                                result = str(text_output)
-                        else:
-                            last_output = interaction.outputs[-1]
-                            if hasattr(last_output, 'text'):
-                                result = last_output.text
-                            else:
-                                result = str(last_output)
-                    else:
-                        result = str(interaction)
+                    result = _extract_text(interaction)
                     
                     if result is not None:
                         return result
@@ -129,12 +142,14 @@ class GeminiClient:
                         error_msg += f"，错误信息: {interaction.error}"
                     raise Exception(error_msg)
                 
-                time.sleep(10)  # 每10秒轮询一次
+                time.sleep(poll_delay)
+                poll_delay = min(poll_delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY_SEC)
                 
         except Exception as e:
             safe_print(f"[{domain_name}] 错误：{str(e)}")
             raise
     
+    @cached("model")
     def call_model(self, prompt, domain_name=None):
         """
         调用 Gemini 模型（非 Deep Research）
@@ -155,24 +170,10 @@ class GeminiClient:
                     model=self.model,
                     input=prompt
                 )
-                if interaction.outputs and len(interaction.outputs) > 0:
-                    text_output = None
-                    for output in interaction.outputs:
-                        if hasattr(output, 'type') and output.type == "text":
-                            text_output = output
-                            break
-                        elif hasattr(output, 'text'):
-                            text_output = output
-                            break
-                    if text_output:
-                        result = text_output.text if hasattr(text_output, 'text') else str(text_output)
-                    else:
-                        last_output = interaction.outputs[-1]
-                        result = last_output.text if hasattr(last_output, 'text') else str(last_output)
-                    if domain_name:
-                        safe_print(f"[{domain_name}] [完成] 处理完成！")
-                    return result
-                return str(interaction)
+                result = _extract_text(interaction)
+                if domain_name and interaction.outputs:
+                    safe_print(f"[{domain_name}] [完成] 处理完成！")
+                return result
             except Exception as e:
                 last_error = e
                 is_timeout = "timeout" in str(e).lower() or "timed out" in str(e).lower() or "disconnect" in str(e).lower()
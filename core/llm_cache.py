@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 结果落盘缓存模块
+按 (provider, model, prompt) 精确匹配缓存模型返回文本，开发调试或失败重跑时相同 prompt 直接命中，
+不再重复消耗 Deep Research 的时间与 token。默认关闭，由 config 的 llm_cache 或环境变量 ESG_LLM_CACHE 开启。
+"""
+import functools
+import hashlib
+import os
+
+from .utils import safe_print
+
+# 缓存目录不随 ESG_JOB_ID 区分，便于 Web 多任务之间复用
+CACHE_DIR = os.path.join("output", ".llm_cache")
+
+
+def make_key(provider, model, prompt):
+    """由 provider、模型名与 prompt 生成缓存键（blake2b 十六进制）"""
+    h = hashlib.blake2b(digest_size=20)
+    for part in (provider, model, prompt):
+        h.update(str(part or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _key_path(key):
+    # 按键前两位分目录，避免单目录文件过多
+    return os.path.join(CACHE_DIR, key[:2], key + ".txt")
+
+
+def get(key):
+    """读取缓存文本，未命中返回 None"""
+    try:
+        with open(_key_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def set(key, value):
+    """写入缓存（临时文件 + os.replace，并发写同一键时不会读到半截内容）"""
+    path = _key_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def cached(model_attr):
+    """
+    客户端方法装饰器：方法签名为 (self, prompt, domain_name=None)，额外接受 force_refresh 关键字。
+    仅当实例 use_cache 为真时生效；model_attr 为实例上记录模型/agent 名称的属性名。
+    force_refresh=True 时跳过读取、重新调用并覆盖缓存。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, prompt, domain_name=None, force_refresh=False):
+            if not getattr(self, "use_cache", False):
+                return func(self, prompt, domain_name)
+            key = make_key(self.cache_provider, getattr(self, model_attr, None), prompt)
+            if not force_refresh:
+                hit = get(key)
+                if hit is not None:
+                    safe_print(f"[{domain_name or 'API'}] 命中本地缓存，跳过调用")
+                    return hit
+            result = func(self, prompt, domain_name)
+            if result:
+                set(key, result)
+            return result
+        return wrapper
+    return decorator
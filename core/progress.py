@@ -3,20 +3,35 @@
 """
 运行进度写入模块，供 Web 前端读取并展示阶段与耗时。
 """
-import json
 import os
 import time
 from pathlib import Path
 
-from core.utils import OUTPUT_BASE
+from core.utils import OUTPUT_BASE, dump_json
 
 PROGRESS_FILE = os.path.join(OUTPUT_BASE, ".progress.json")
 
 _START_TIMES = {}  # stage_id -> start time
+_OUTPUT_READY = False  # 输出目录已创建，避免每次写进度都 mkdir
 
 
 def _ensure_output():
+    global _OUTPUT_READY
+    if _OUTPUT_READY:
+        return
     Path(OUTPUT_BASE).mkdir(parents=True, exist_ok=True)
+    _OUTPUT_READY = True
+
+
+def _write_progress_file(data):
+    """先写临时文件再 os.replace，保证 Web 端读取时不会读到写了一半的 JSON。"""
+    tmp_file = PROGRESS_FILE + ".tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(dump_json(data))
+        os.replace(tmp_file, PROGRESS_FILE)
+    except Exception:
+        pass
 
 
 def write_progress(current_stage_id, current_stage_label, completed_stages=None):
@@ -34,11 +49,7 @@ def write_progress(current_stage_id, current_stage_label, completed_stages=None)
     }
     if total_started:
         data["total_elapsed_sec"] = round(time.time() - total_started, 1)
-    try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=0)
-    except Exception:
-        pass
+    _write_progress_file(data)
 
 
 def start_total():
@@ -78,11 +89,7 @@ def write_progress_done(completed_stages):
     }
     if total_started:
         data["total_elapsed_sec"] = round(time.time() - total_started, 1)
-    try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=0)
-    except Exception:
-        pass
+    _write_progress_file(data)
 
 
 def write_progress_error(completed_stages, current_stage_id, current_stage_label):
@@ -98,8 +105,4 @@ def write_progress_error(completed_stages, current_stage_id, current_stage_label
     }
     if total_started:
         data["total_elapsed_sec"] = round(time.time() - total_started, 1)
-    try:
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=0)
-    except Exception:
-        pass
+    _write_progress_file(data)
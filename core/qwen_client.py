@@ -6,66 +6,149 @@
 官方说明：qwen-deep-research 仅支持流式输出（stream=True），见
 https://help.aliyun.com/zh/model-studio/qwen-deep-research
 """
+import contextlib
+import os
+import random
+import time
+
 import dashscope
-from .utils import safe_print
+from .utils import OUTPUT_BASE, safe_print
+from .llm_cache import cached
 
 DEFAULT_DEEP_RESEARCH_MODEL = "qwen-deep-research"
 DEFAULT_CHAT_MODEL = "qwen3-max-preview"
 
+# 瞬时错误重试：限流/服务端错误或网络异常时最多尝试 3 次，间隔 1s、2s（指数退避 + 随机抖动）
+TRANSIENT_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY_SEC = 2.0
+
+# Deep Research 第二阶段的流式内容边收边落盘，进程中途退出时可从这里手动找回
+PARTIAL_DIR = os.path.join(OUTPUT_BASE, ".partial")
+
+
+class TransientAPIError(ValueError):
+    """可重试的 API 错误（429/5xx）；继承 ValueError，调用方原有的错误处理不受影响"""
+
 
-def _collect_stream_content(responses, domain_name):
+def _api_error(status, code, message):
+    """按状态码构造 API 错误：瞬时错误返回 TransientAPIError，其余为 ValueError"""
+    cls = TransientAPIError if status in TRANSIENT_STATUS_CODES else ValueError
+    return cls(f"API 错误 status={status}, code={code}, message={message}")
+
+
+def _partial_path(domain_name):
+    return os.path.join(PARTIAL_DIR, f"{domain_name}.stream.txt")
+
+
+def _collect_stream_content(responses, domain_name, sink_path=None):
     """
     按官方文档解析 qwen-deep-research 流式响应：
     response.output.message.content 为每块内容，phase=KeepAlive 可忽略。
     返回累积的文本；若遇非 200 则抛错。
+    sink_path 非空时每块内容同时写入该文件并立即 flush（覆盖写，重试时重新开始）。
     """
     full_content = []
-    for response in responses:
-        if getattr(response, "status_code", None) and response.status_code != 200:
-            msg = getattr(response, "message", None) or ""
-            code = getattr(response, "code", None) or ""
-            raise ValueError(f"API 错误 status={response.status_code}, code={code}, message={msg}")
-        output = getattr(response, "output", None) or (response.get("output") if isinstance(response, dict) else None)
-        if not output:
-            continue
-        msg = output.get("message", {}) if isinstance(output, dict) else getattr(output, "message", None)
-        if not msg:
-            continue
-        phase = msg.get("phase") if isinstance(msg, dict) else getattr(msg, "phase", None)
-        if phase == "KeepAlive":
-            continue
-        content = msg.get("content", "") if isinstance(msg, dict) else getattr(msg, "content", None)
-        if content:
-            full_content.append(str(content))
+    append = full_content.append
+    if sink_path:
+        os.makedirs(os.path.dirname(sink_path), exist_ok=True)
+    with (open(sink_path, "w", encoding="utf-8") if sink_path else contextlib.nullcontext()) as sink:
+        for response in responses:
+            status_code = getattr(response, "status_code", None)
+            if status_code and status_code != 200:
+                msg = getattr(response, "message", None) or ""
+                code = getattr(response, "code", None) or ""
+                raise _api_error(status_code, code, msg)
+            output = getattr(response, "output", None) or (response.get("output") if isinstance(response, dict) else None)
+            if not output:
+                continue
+            msg = output.get("message") if isinstance(output, dict) else getattr(output, "message", None)
+            if not msg:
+                continue
+            if isinstance(msg, dict):
+                if msg.get("phase") == "KeepAlive":
+                    continue
+                content = msg.get("content")
+            else:
+                if getattr(msg, "phase", None) == "KeepAlive":
+                    continue
+                content = getattr(msg, "content", None)
+            if content:
+                # 流式分块绝大多数已是 str，避免逐块 str() 复制
+                chunk = content if isinstance(content, str) else str(content)
+                append(chunk)
+                if sink is not None:
+                    sink.write(chunk)
+                    sink.flush()
     return "".join(full_content).strip() or None
 
 
 class QwenClient:
     """千问 API 客户端，接口与 GeminiClient 对齐：call_deep_research、call_model"""
 
-    def __init__(self, api_key, model=None, deep_research_model=None):
+    cache_provider = "qwen"
+
+    def __init__(self, api_key, model=None, deep_research_model=None, use_cache=False, skip_confirm=False):
         self.api_key = api_key
         self.model = model or DEFAULT_CHAT_MODEL
         self.deep_research_model = deep_research_model or DEFAULT_DEEP_RESEARCH_MODEL
+        self.use_cache = use_cache
+        # 跳过第一阶段「反问确认」请求，直接以固定确认语进入深入研究（提示词已足够明确时可省一次往返）
+        self.skip_confirm = skip_confirm
+
+    def _call_with_retry(self, fn, *args, domain_name=None):
+        """执行 fn(*args)，遇到 429/5xx 或网络异常（requests 异常均为 OSError 子类）时指数退避重试"""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return fn(*args)
+            except (TransientAPIError, OSError) as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                delay = RETRY_BASE_DELAY_SEC ** attempt + random.uniform(0, 0.5)
+                safe_print(f"[{domain_name or 'API'}] 瞬时错误：{e}，{delay:.1f} 秒后重试（{attempt + 2}/{MAX_ATTEMPTS}）…")
+                time.sleep(delay)
 
+    def _stream_deep_research(self, messages, domain_name, sink_path=None):
+        """流式调用 Deep Research 模型并收集完整文本（重试时整段流重新请求）"""
+        responses = dashscope.Generation.call(
+            api_key=self.api_key,
+            model=self.deep_research_model,
+            messages=messages,
+            stream=True,
+        )
+        return _collect_stream_content(responses, domain_name, sink_path)
+
+    def _generate(self, messages):
+        """非流式调用对话模型并提取文本"""
+        resp = dashscope.Generation.call(
+            api_key=self.api_key,
+            model=self.model,
+            messages=messages,
+            stream=False,
+        )
+        return _get_message_content(resp)
+
+    @cached("deep_research_model")
     def call_deep_research(self, prompt, domain_name):
         """
         调用 Qwen-Deep-Research：两阶段（反问确认 → 深入研究），返回最终研究报告。
         必须使用流式输出（stream=True），否则会因长连接导致超时。
+        skip_confirm 为真时不发第一阶段请求，以固定确认语作为 assistant 回合直接进入深入研究。
         """
         safe_print(f"\n[{domain_name}] 开始 Qwen Deep Research（流式）...")
-        # 第一阶段：模型反问确认（官方仅支持 stream=True）
-        messages_step1 = [{"role": "user", "content": prompt}]
-        responses1 = dashscope.Generation.call(
-            api_key=self.api_key,
-            model=self.deep_research_model,
-            messages=messages_step1,
-            stream=True,
-        )
-        step1_content = _collect_stream_content(responses1, domain_name)
+        if self.skip_confirm:
+            step1_content = None
+            safe_print(f"[{domain_name}] 已跳过反问确认，直接进入深入研究...")
+        else:
+            # 第一阶段：模型反问确认（官方仅支持 stream=True）
+            messages_step1 = [{"role": "user", "content": prompt}]
+            step1_content = self._call_with_retry(self._stream_deep_research, messages_step1, domain_name, domain_name=domain_name)
+            if step1_content:
+                safe_print(f"[{domain_name}] 第一阶段完成，进入深入研究...")
+            else:
+                safe_print(f"[{domain_name}] [警告] 第一阶段无返回内容，使用默认确认语进入深入研究...")
         if not step1_content:
             step1_content = "请直接进行深入研究。"
-        safe_print(f"[{domain_name}] 第一阶段完成，进入深入研究...")
 
         # 第二阶段：深入研究，输出完整报告
         messages_step2 = [
@@ -73,30 +156,29 @@ class QwenClient:
             {"role": "assistant", "content": step1_content},
             {"role": "user", "content": "请直接基于上述研究主题进行深入研究，输出完整的研究报告内容，无需再追问。"},
         ]
-        responses2 = dashscope.Generation.call(
-            api_key=self.api_key,
-            model=self.deep_research_model,
-            messages=messages_step2,
-            stream=True,
-        )
-        result = _collect_stream_content(responses2, domain_name)
+        sink_path = _partial_path(domain_name)
+        if os.path.exists(sink_path):
+            # 上次运行中断留下的内容，改名保留，避免被本次覆盖
+            prev_path = sink_path[:-len(".txt")] + ".prev.txt"
+            os.replace(sink_path, prev_path)
+            safe_print(f"[{domain_name}] 发现上次未完成的研究内容，已保留至 {prev_path}")
+        result = self._call_with_retry(self._stream_deep_research, messages_step2, domain_name, sink_path, domain_name=domain_name)
         if result:
+            try:
+                os.remove(sink_path)
+            except OSError:
+                pass
             safe_print(f"[{domain_name}] [完成] 研究完成！")
             return result
         raise Exception("无法获取研究结果")
 
+    @cached("model")
     def call_model(self, prompt, domain_name=None):
         """调用千问对话模型（如 qwen3-max-preview）进行润色/热点/合并等。"""
         if domain_name:
             safe_print(f"\n[{domain_name}] 开始处理...")
         messages = [{"role": "user", "content": prompt}]
-        resp = dashscope.Generation.call(
-            api_key=self.api_key,
-            model=self.model,
-            messages=messages,
-            stream=False,
-        )
-        result = _get_message_content(resp)
+        result = self._call_with_retry(self._generate, messages, domain_name=domain_name)
         if result is None:
             raise ValueError("模型未返回有效内容")
         if domain_name:
@@ -104,97 +186,121 @@ class QwenClient:
         return result
 
 
+def _field(obj, key):
+    """按 dict 键或对象属性取值，取不到返回 None"""
+    return obj.get(key) if isinstance(obj, dict) else getattr(obj, key, None)
+
+
+def _str_content(x):
+    if x is None:
+        return None
+    s = str(x).strip()
+    return s if s else None
+
+
+def _scalar_text(x):
+    """仅接受 str/int/float 标量，返回去空白后的文本"""
+    return _str_content(x) if isinstance(x, (str, int, float)) else None
+
+
+def _extract_output_text(output):
+    """output.text（部分接口）"""
+    text = _scalar_text(_field(output, "text"))
+    if text:
+        return text
+    raw = getattr(output, "text", None)
+    return _str_content(raw) if raw else None
+
+
+def _extract_message_content(output):
+    """output.message -> content / text / body（Deep Research 等可能返回 message 对象、字符串或分段列表）"""
+    msg = _field(output, "message")
+    if msg is None:
+        return None
+    if isinstance(msg, str):
+        return msg.strip() or None
+    for key in ("content", "text", "body"):
+        text = _scalar_text(_field(msg, key))
+        if text:
+            return text
+    if isinstance(msg, dict):
+        for key in ("content", "text", "body"):
+            v = msg.get(key)
+            if not isinstance(v, list):
+                continue
+            for part in v:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    text = _str_content(part.get("text"))
+                    if text:
+                        return text
+                if isinstance(part, str) and part.strip():
+                    return part.strip()
+    for key in ("content", "text"):
+        raw = getattr(msg, key, None)
+        if raw:
+            return _str_content(raw)
+    return None
+
+
+def _extract_choices_content(output):
+    """output.choices[0].message.content 或 choices[0].text/content（OpenAI 兼容格式）"""
+    choices = _field(output, "choices")
+    if not choices or not hasattr(choices, "__getitem__"):
+        return None
+    first = choices[0]
+    if first is None:
+        return None
+    msg = _field(first, "message")
+    if msg is not None:
+        text = _scalar_text(_field(msg, "content")) or _scalar_text(_field(msg, "text"))
+        if text:
+            return text
+    for key in ("text", "content"):
+        direct = _field(first, key)
+        if direct:
+            return _str_content(direct)
+    return None
+
+
+def _extract_result_body(output):
+    """output.result / output.body"""
+    for key in ("result", "body"):
+        val = _field(output, key)
+        if val:
+            text = _str_content(val)
+            if text:
+                return text
+    return None
+
+
+# 按顺序尝试的 assistant 文本提取器，第一个非空结果即返回
+_EXTRACTORS = (
+    _extract_output_text,
+    _extract_message_content,
+    _extract_choices_content,
+    _extract_result_body,
+)
+
+
 def _get_message_content(response, domain_name=None):
     """从 DashScope Generation 响应中提取 assistant 文本。兼容 dict 与对象及多种返回格式。"""
     if not response:
         return None
-    status = getattr(response, "status_code", None) or (response.get("status_code") if isinstance(response, dict) else None)
+    is_dict = isinstance(response, dict)
+    status = getattr(response, "status_code", None) or (response.get("status_code") if is_dict else None)
     if status != 200:
-        msg = getattr(response, "message", None) or (response.get("message") if isinstance(response, dict) else None)
-        code = getattr(response, "code", None) or (response.get("code") if isinstance(response, dict) else None)
-        raise ValueError(f"API 错误 status={status}, code={code}, message={msg}")
-    output = getattr(response, "output", None) if not isinstance(response, dict) else response.get("output")
+        msg = getattr(response, "message", None) or (response.get("message") if is_dict else None)
+        code = getattr(response, "code", None) or (response.get("code") if is_dict else None)
+        raise _api_error(status, code, msg)
+    output = response.get("output") if is_dict else getattr(response, "output", None)
     if not output:
         _log_parse_fail(domain_name, "output 为空")
         return None
 
-    def _str_content(x):
-        if x is None:
-            return None
-        s = str(x).strip()
-        return s if s else None
-
-    def _get(obj, *keys):
-        if obj is None:
-            return None
-        for k in keys:
-            if isinstance(obj, dict):
-                obj = obj.get(k)
-            else:
-                obj = getattr(obj, k, None)
-            if obj is None:
-                return None
-        return _str_content(obj) if isinstance(obj, (str, int, float)) else None
-
-    # 1. output.text（部分接口）
-    text = _get(output, "text") or (getattr(output, "text", None) and _str_content(getattr(output, "text")))
-    if text:
-        return text
-
-    # 2. output.message -> content / text（Deep Research 等可能返回 message 对象或列表）
-    msg = output.get("message") if isinstance(output, dict) else getattr(output, "message", None)
-    if msg is not None:
-        if isinstance(msg, str) and msg.strip():
-            return msg.strip()
-        content = _get(msg, "content") or _get(msg, "text") or _get(msg, "body")
-        if content:
-            return content
-        if isinstance(msg, dict):
-            for key in ("content", "text", "body"):
-                v = msg.get(key)
-                if v is not None and (isinstance(v, str) or (isinstance(v, list) and v)):
-                    if isinstance(v, str):
-                        return _str_content(v)
-                    if isinstance(v, list):
-                        for part in v:
-                            if isinstance(part, dict) and part.get("type") == "text":
-                                t = part.get("text")
-                                if t:
-                                    return _str_content(t)
-                            if isinstance(part, str) and part.strip():
-                                return part.strip()
-        if hasattr(msg, "content"):
-            c = getattr(msg, "content", None)
-            if c:
-                return _str_content(c)
-        if hasattr(msg, "text"):
-            t = getattr(msg, "text", None)
-            if t:
-                return _str_content(t)
-
-    # 3. output.choices[0].message.content（OpenAI 兼容格式）
-    choices = output.get("choices") if isinstance(output, dict) else getattr(output, "choices", None)
-    if choices and len(choices) > 0:
-        first = choices[0] if isinstance(choices, list) else (choices[0] if hasattr(choices, "__getitem__") else None)
-        if first is not None:
-            msg = first.get("message") if isinstance(first, dict) else getattr(first, "message", None)
-            if msg is not None:
-                content = _get(msg, "content") or _get(msg, "text")
-                if content:
-                    return content
-            # choices[0].text 直接
-            direct = first.get("text") if isinstance(first, dict) else getattr(first, "text", None)
-            if direct:
-                return _str_content(direct)
-            direct = first.get("content") if isinstance(first, dict) else getattr(first, "content", None)
-            if direct:
-                return _str_content(direct)
-
-    # 4. output.result / output.body
-    for key in ("result", "body"):
-        val = output.get(key) if isinstance(output, dict) else getattr(output, key, None)
-        if val and _str_content(val):
-            return _str_content(val)
+    for extract in _EXTRACTORS:
+        text = extract(output)
+        if text:
+            return text
 
     _log_parse_fail(domain_name, "无有效 content/text")
     return None
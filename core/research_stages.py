@@ -10,6 +10,22 @@ from .qwen_client import QwenClient
 from .utils import load_prompt, replace_date_placeholders, replace_domain_placeholders, safe_print
 
 
+# 热点聚焦/合并输入中 E、S、G 章节的标题
+_DOMAIN_SECTION_TITLES = (
+    ("E", "【环境（E）章节】"),
+    ("S", "【社会（S）章节】"),
+    ("G", "【治理（G）章节】"),
+)
+
+
+def _domain_sections(polished_results):
+    """拼接 E、S、G 三个章节正文；领域缺失或结果为 None 时写「无内容」，避免把 "None" 送进提示词"""
+    return "\n".join(
+        f"{title}\n{polished_results.get(domain) or '无内容'}\n"
+        for domain, title in _DOMAIN_SECTION_TITLES
+    )
+
+
 class ResearchPipeline:
     """研究流程管道类，支持 Gemini 或千问（Qwen）"""
     
@@ -18,30 +34,53 @@ class ResearchPipeline:
         初始化研究流程
         
         Args:
-            config: 配置字典，含 provider("gemini"|"qwen")、api_keys、api_key、agent、model、qwen_model、qwen_deep_research_model 等
+            config: 配置字典，含 provider("gemini"|"qwen")、api_keys、api_key、agent、model、qwen_model、qwen_deep_research_model、
+                qwen_skip_confirm、llm_cache、llm_cache_refresh 等
         """
         self.api_keys = config["api_keys"]
         self.api_key = config["api_key"]
         provider = config.get("provider", "gemini")
+        # 阶段1/2 共用一个线程池（E/S/G 三路并行），避免每个阶段重复创建、销毁线程
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="esg-llm")
+        use_cache = bool(config.get("llm_cache"))
+        # 强制刷新：忽略已有缓存重新调用，并用新结果覆盖
+        self.force_refresh = bool(config.get("llm_cache_refresh"))
         
         if provider == "qwen":
             qwen_model = config.get("qwen_model", "qwen3-max-preview")
             qwen_dr_model = config.get("qwen_deep_research_model", "qwen-deep-research")
-            self.clients = {
-                "E": QwenClient(self.api_keys["E"], deep_research_model=qwen_dr_model),
-                "S": QwenClient(self.api_keys["S"], deep_research_model=qwen_dr_model),
-                "G": QwenClient(self.api_keys["G"], deep_research_model=qwen_dr_model),
-            }
-            self.default_client = QwenClient(self.api_key, model=qwen_model, deep_research_model=qwen_dr_model)
+            skip_confirm = bool(config.get("qwen_skip_confirm"))
+            if len({self.api_key, *self.api_keys.values()}) == 1:
+                # 千问通常 E/S/G 共用同一个 Key：QwenClient 无连接状态，共用一个实例即可
+                shared = QwenClient(self.api_key, model=qwen_model, deep_research_model=qwen_dr_model, use_cache=use_cache, skip_confirm=skip_confirm)
+                self.clients = {"E": shared, "S": shared, "G": shared}
+                self.default_client = shared
+            else:
+                self.clients = {
+                    "E": QwenClient(self.api_keys["E"], deep_research_model=qwen_dr_model, use_cache=use_cache, skip_confirm=skip_confirm),
+                    "S": QwenClient(self.api_keys["S"], deep_research_model=qwen_dr_model, use_cache=use_cache, skip_confirm=skip_confirm),
+                    "G": QwenClient(self.api_keys["G"], deep_research_model=qwen_dr_model, use_cache=use_cache, skip_confirm=skip_confirm),
+                }
+                self.default_client = QwenClient(self.api_key, model=qwen_model, deep_research_model=qwen_dr_model, use_cache=use_cache, skip_confirm=skip_confirm)
         else:
             self.agent = config.get("agent", "deep-research-pro-preview-12-2025")
             self.model = config.get("model", "gemini-3-pro-preview")
             self.clients = {
-                "E": GeminiClient(self.api_keys["E"], agent=self.agent),
-                "S": GeminiClient(self.api_keys["S"], agent=self.agent),
-                "G": GeminiClient(self.api_keys["G"], agent=self.agent),
+                "E": GeminiClient(self.api_keys["E"], agent=self.agent, use_cache=use_cache),
+                "S": GeminiClient(self.api_keys["S"], agent=self.agent, use_cache=use_cache),
+                "G": GeminiClient(self.api_keys["G"], agent=self.agent, use_cache=use_cache),
             }
-            self.default_client = GeminiClient(self.api_key, model=self.model)
+            self.default_client = GeminiClient(self.api_key, model=self.model, use_cache=use_cache)
+
+    def close(self):
+        """关闭共用线程池（等待已提交任务结束）"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def stage1_research_parallel(self, date_info):
         """
@@ -59,29 +98,29 @@ class ResearchPipeline:
         safe_print("=" * 60)
         
         # 加载统一提示词模板，按领域与日期替换占位符
-        research_template = load_prompt("章节研究.txt")
-        prompt_E = replace_domain_placeholders(replace_date_placeholders(research_template, date_info), "E")
-        prompt_S = replace_domain_placeholders(replace_date_placeholders(research_template, date_info), "S")
-        prompt_G = replace_domain_placeholders(replace_date_placeholders(research_template, date_info), "G")
+        research_template = replace_date_placeholders(load_prompt("章节研究.txt"), date_info)
+        prompt_E = replace_domain_placeholders(research_template, "E")
+        prompt_S = replace_domain_placeholders(research_template, "S")
+        prompt_G = replace_domain_placeholders(research_template, "G")
         
         results = {}
         
         # 使用3个不同的API Key并行执行三个领域的研究
         safe_print("\n并行进行 E、S、G 三个领域的 Deep Research（每个领域使用独立的API Key）")
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {
-                executor.submit(self.clients["E"].call_deep_research, prompt_E, "环境(E)"): "E",
-                executor.submit(self.clients["S"].call_deep_research, prompt_S, "社会(S)"): "S",
-                executor.submit(self.clients["G"].call_deep_research, prompt_G, "治理(G)"): "G"
-            }
-            
-            for future in as_completed(futures):
-                domain = futures[future]
-                try:
-                    results[domain] = future.result()
-                except Exception as e:
-                    safe_print(f"[{domain}] 研究失败：{str(e)}")
-                    results[domain] = None
+        executor = self._executor
+        futures = {
+            executor.submit(self.clients["E"].call_deep_research, prompt_E, "环境(E)", force_refresh=self.force_refresh): "E",
+            executor.submit(self.clients["S"].call_deep_research, prompt_S, "社会(S)", force_refresh=self.force_refresh): "S",
+            executor.submit(self.clients["G"].call_deep_research, prompt_G, "治理(G)", force_refresh=self.force_refresh): "G"
+        }
+        
+        for future in as_completed(futures):
+            domain = futures[future]
+            try:
+                results[domain] = future.result()
+            except Exception as e:
+                safe_print(f"[{domain}] 研究失败：{str(e)}")
+                results[domain] = None
         
         return results
     
@@ -102,34 +141,34 @@ class ResearchPipeline:
         safe_print("=" * 60)
         
         # 加载统一润色提示词模板，按领域与日期替换占位符
-        polish_template = load_prompt("章节润色.txt")
+        polish_template = replace_date_placeholders(load_prompt("章节润色.txt"), date_info)
         polish_prompts = {}
         for domain in ["E", "S", "G"]:
             if research_results.get(domain):
-                template = replace_domain_placeholders(replace_date_placeholders(polish_template, date_info), domain)
+                template = replace_domain_placeholders(polish_template, domain)
                 polish_prompts[domain] = f"{template}\n\n以下是需要润色的内容：\n\n{research_results[domain]}"
             else:
                 polish_prompts[domain] = None
         
         # 并行执行润色
         polished_results = {}
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {}
-            for domain in ["E", "S", "G"]:
-                if polish_prompts[domain]:
-                    futures[executor.submit(
-                        self.default_client.call_model, 
-                        polish_prompts[domain], 
-                        f"润色-{domain}"
-                    )] = domain
-            
-            for future in as_completed(futures):
-                domain = futures[future]
-                try:
-                    polished_results[domain] = future.result()
-                except Exception as e:
-                    safe_print(f"[润色-{domain}] 失败：{str(e)}")
-                    polished_results[domain] = research_results.get(domain)  # 使用原始结果
+        futures = {}
+        for domain in ["E", "S", "G"]:
+            if polish_prompts[domain]:
+                futures[self._executor.submit(
+                    self.default_client.call_model, 
+                    polish_prompts[domain], 
+                    f"润色-{domain}",
+                    force_refresh=self.force_refresh,
+                )] = domain
+        
+        for future in as_completed(futures):
+            domain = futures[future]
+            try:
+                polished_results[domain] = future.result()
+            except Exception as e:
+                safe_print(f"[润色-{domain}] 失败：{str(e)}")
+                polished_results[domain] = research_results.get(domain)  # 使用原始结果
         
         return polished_results
     
@@ -155,22 +194,11 @@ class ResearchPipeline:
         hotspot_template = replace_date_placeholders(hotspot_template, date_info)
         
         # 构建输入内容（完整内容，不截断，保证质量）
-        input_content = f"""
-以下是E、S、G三个章节的研究内容：
-
-【环境（E）章节】
-{polished_results.get('E', '无内容')}
-
-【社会（S）章节】
-{polished_results.get('S', '无内容')}
-
-【治理（G）章节】
-{polished_results.get('G', '无内容')}
-"""
+        input_content = "\n以下是E、S、G三个章节的研究内容：\n\n" + _domain_sections(polished_results)
         
         prompt = f"{hotspot_template}\n\n{input_content}"
         
-        hotspot_result = self.default_client.call_model(prompt, "热点聚焦")
+        hotspot_result = self.default_client.call_model(prompt, "热点聚焦", force_refresh=self.force_refresh)
         return hotspot_result
     
     def stage4_merge(self, polished_results, hotspot_result, date_info):
@@ -196,21 +224,12 @@ class ResearchPipeline:
         merge_template = replace_date_placeholders(merge_template, date_info)
         
         # 构建输入内容（完整内容，不截断，保证质量）
-        input_content = f"""
-【热点聚焦部分】
-{hotspot_result}
-
-【环境（E）章节】
-{polished_results.get('E', '无内容')}
-
-【社会（S）章节】
-{polished_results.get('S', '无内容')}
-
-【治理（G）章节】
-{polished_results.get('G', '无内容')}
-"""
+        input_content = "".join((
+            "\n【热点聚焦部分】\n", hotspot_result or "无内容", "\n\n",
+            _domain_sections(polished_results),
+        ))
         
         prompt = f"{merge_template}\n\n{input_content}"
         
-        final_result = self.default_client.call_model(prompt, "合并")
+        final_result = self.default_client.call_model(prompt, "合并", force_refresh=self.force_refresh)
         return final_result
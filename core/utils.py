@@ -2,37 +2,72 @@
 工具函数模块
 包含配置加载、提示词加载、日期处理、output 目录规则等通用功能
 """
+import functools
 import os
 import json
+import re
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 import threading
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 支持 Web 多任务：环境变量 ESG_JOB_ID 存在时，输出到 output/<job_id>/，否则 output/
 _job_id = os.environ.get("ESG_JOB_ID", "")
 OUTPUT_BASE = os.path.join("output", _job_id) if _job_id else "output"
 
 # 线程锁用于打印
 print_lock = threading.Lock()
+# GBK 终端无法编码的符号 -> ASCII 兼容文本
+_GBK_REPLACEMENTS = str.maketrans({"✓": "[完成]", "✗": "[失败]"})
 
 
-def safe_print(*args, **kwargs):
+def safe_print(*args, sep=" ", end="\n", file=None, flush=True):
     """线程安全的打印函数，默认 flush 以便子进程输出实时进入管道（如 Web 运行日志）。
+    参数先拼成一行再单次写出，锁内只做 write/flush。
     自动处理 Windows GBK 编码问题，将 Unicode 特殊字符替换为 ASCII 兼容字符。
     """
+    stream = file if file is not None else sys.stdout
+    if stream is None:
+        # pythonw / 无控制台的服务进程中 sys.stdout 为 None，与 print 一样静默忽略
+        return
+    line = (" " if sep is None else sep).join(map(str, args)) + ("\n" if end is None else end)
     with print_lock:
-        kwargs.setdefault("flush", True)
         try:
-            print(*args, **kwargs)
+            stream.write(line)
         except UnicodeEncodeError:
             # Windows 终端 GBK 编码无法处理某些 Unicode 字符，替换为 ASCII
-            safe_args = []
-            for arg in args:
-                if isinstance(arg, str):
-                    safe_args.append(arg.replace("✓", "[完成]").replace("✗", "[失败]"))
-                else:
-                    safe_args.append(arg)
-            print(*safe_args, **kwargs)
+            stream.write(line.translate(_GBK_REPLACEMENTS))
+        if flush:
+            stream.flush()
+
+
+def load_json(path):
+    """读取 JSON 文件：安装了 orjson 时直接解析字节，否则用标准库 json"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dump_json(data, indent=False):
+    """
+    将数据编码为 UTF-8 JSON 字节（非 ASCII 字符不转义）。indent=True 时按 2 空格缩进，
+    与 json.dump(indent=2) 输出一致；安装了 orjson 时用其编码，否则用标准库 json。
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+def _env_flag(name):
+    """环境变量布尔开关：1/true/yes/on（不区分大小写）视为开启"""
+    return (os.environ.get(name) or "").strip().lower() in ("1", "true", "yes", "on")
 
 
 def load_config(provider_override=None, api_key_override=None):
@@ -43,8 +78,7 @@ def load_config(provider_override=None, api_key_override=None):
     """
     config_path = "config.json"
     if os.path.exists(config_path):
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = load_json(config_path)
         def _g(key, default=None):
             return config.get(key, default)
         _gemini = config.get("gemini") if isinstance(config.get("gemini"), dict) else {}
@@ -56,6 +90,7 @@ def load_config(provider_override=None, api_key_override=None):
         config.setdefault("qwen_api_key", _qwen.get("api_key") or _g("qwen_api_key"))
         config.setdefault("qwen_model", _qwen.get("model") or _g("qwen_model", "qwen3-max-preview"))
         config.setdefault("qwen_deep_research_model", _qwen.get("deep_research_model") or _g("qwen_deep_research_model", "qwen-deep-research"))
+        config.setdefault("qwen_skip_confirm", bool(_qwen.get("skip_confirm") or _g("qwen_skip_confirm", False)))
     else:
         # 无 config.json 时使用默认值，Key 仅从环境变量读取（由前端经 app 传入）
         config = {
@@ -73,6 +108,11 @@ def load_config(provider_override=None, api_key_override=None):
         provider = "gemini"
     config["provider"] = provider
 
+    # LLM 结果落盘缓存（core.llm_cache）：config 中 llm_cache 或环境变量 ESG_LLM_CACHE=1 开启；
+    # ESG_LLM_CACHE_REFRESH=1 时忽略已有缓存重新调用
+    config["llm_cache"] = bool(config.get("llm_cache")) or _env_flag("ESG_LLM_CACHE")
+    config["llm_cache_refresh"] = bool(config.get("llm_cache_refresh")) or _env_flag("ESG_LLM_CACHE_REFRESH")
+
     # 前端或环境传入的 Key 优先（main 通过 env 传入，此处仅从 env 读取）
     runtime_single = (os.environ.get("ESG_RUNTIME_API_KEY") or "").strip()
     runtime_e = (os.environ.get("ESG_RUNTIME_API_KEY_E") or runtime_single).strip()
@@ -118,8 +158,9 @@ def load_config(provider_override=None, api_key_override=None):
     return config
 
 
+@functools.lru_cache(maxsize=None)
 def load_prompt(prompt_file):
-    """加载提示词文件"""
+    """加载提示词文件（运行期间模板不变，按文件名缓存；需重新读取时调用 load_prompt.cache_clear()）"""
     prompt_path = os.path.join("prompt", prompt_file)
     if not os.path.exists(prompt_path):
         raise FileNotFoundError(f"提示词文件 {prompt_path} 不存在")
@@ -145,15 +186,27 @@ def get_yesterday_date_range():
 
 
 def _build_date_info(start_dt, end_dt, report_type, report_label):
-    """构建统一的日期信息字典，含 report_type / report_label"""
+    """构建统一的日期信息字典，含 report_type / report_label（每种格式只 strftime 一次）"""
+    start_cn = start_dt.strftime("%Y年%m月%d日")
+    start_iso = start_dt.strftime("%Y-%m-%d")
+    start_dot = start_dt.strftime("%Y.%m.%d")
+    if start_dt == end_dt:
+        end_cn, end_iso = start_cn, start_iso
+        range_cn, range_iso, range_compact = start_cn, start_iso, start_dot
+    else:
+        end_cn = end_dt.strftime("%Y年%m月%d日")
+        end_iso = end_dt.strftime("%Y-%m-%d")
+        range_cn = f"{start_cn} 至 {end_cn}"
+        range_iso = f"{start_iso} 至 {end_iso}"
+        range_compact = f"{start_dot}-{end_dt.strftime('%Y.%m.%d')}"
     return {
-        "start_date_chinese": start_dt.strftime("%Y年%m月%d日"),
-        "end_date_chinese": end_dt.strftime("%Y年%m月%d日"),
-        "start_date_iso": start_dt.strftime("%Y-%m-%d"),
-        "end_date_iso": end_dt.strftime("%Y-%m-%d"),
-        "date_range_chinese": f"{start_dt.strftime('%Y年%m月%d日')} 至 {end_dt.strftime('%Y年%m月%d日')}" if start_dt != end_dt else start_dt.strftime("%Y年%m月%d日"),
-        "date_range_iso": f"{start_dt.strftime('%Y-%m-%d')} 至 {end_dt.strftime('%Y-%m-%d')}" if start_dt != end_dt else start_dt.strftime("%Y-%m-%d"),
-        "date_range_compact": f"{start_dt.strftime('%Y.%m.%d')}-{end_dt.strftime('%Y.%m.%d')}" if start_dt != end_dt else start_dt.strftime("%Y.%m.%d"),
+        "start_date_chinese": start_cn,
+        "end_date_chinese": end_cn,
+        "start_date_iso": start_iso,
+        "end_date_iso": end_iso,
+        "date_range_chinese": range_cn,
+        "date_range_iso": range_iso,
+        "date_range_compact": range_compact,
         "report_type": report_type,
         "report_label": report_label,
     }
@@ -166,13 +219,16 @@ def get_date_range_for_mode(mode):
     return get_last_week_date_range()
 
 
+_DASH_STRIP = str.maketrans("", "", "-")
+
+
 def get_output_date_suffix(date_info):
     """
     返回用于文件名的日期部分（放在最前）：周报为 YYYYMMDD_YYYYMMDD，日报为 YYYYMMDD。
     用于 {suffix}_原始内容.txt、{suffix}_报告.json、{suffix}_最终版.docx。
     """
-    start_str = date_info["start_date_iso"].replace("-", "")
-    end_str = date_info["end_date_iso"].replace("-", "")
+    start_str = date_info["start_date_iso"].translate(_DASH_STRIP)
+    end_str = date_info["end_date_iso"].translate(_DASH_STRIP)
     if start_str == end_str:
         return start_str
     return f"{start_str}_{end_str}"
@@ -194,6 +250,26 @@ def get_template_path(ext):
     return p if os.path.exists(p) else name
 
 
+def _latest_file_mtime(root):
+    """递归求目录下文件的最新修改时间；用 os.scandir 一次取得类型与 stat，不再 is_file + stat 各走一次系统调用。"""
+    best = 0
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    mtime = entry.stat().st_mtime
+                    if mtime > best:
+                        best = mtime
+    return best
+
+
 def get_latest_output_subdir(base_dir=None):
     """
     在 output 下查找「最近一次生成」的目录：比较 weekly/ 与 daily/ 内文件最新修改时间。
@@ -208,7 +284,7 @@ def get_latest_output_subdir(base_dir=None):
         kind_dir = base / kind
         if not kind_dir.is_dir():
             continue
-        mtime = max((f.stat().st_mtime for f in kind_dir.rglob("*") if f.is_file()), default=0)
+        mtime = _latest_file_mtime(kind_dir)
         if mtime > best_mtime:
             best_mtime = mtime
             best_subdir = kind
@@ -224,23 +300,33 @@ def find_latest_report_json(base_dir=None):
     base = Path(base_dir or OUTPUT_BASE)
     if not base.exists():
         return None
-    candidates = []
-    for kind in ("weekly", "daily"):
-        for p in (base / kind).glob("*_报告.json"):
-            if p.is_file():
-                candidates.append(p)
-        for p in (base / kind).glob("报告_*.json"):
-            if p.is_file():
-                candidates.append(p)
-        p_legacy = base / kind / "报告.json"
-        if p_legacy.is_file():
-            candidates.append(p_legacy)
-    for p in base.glob("ESG投研*_*.json"):
-        if p.is_file():
-            candidates.append(p)
-    if not candidates:
-        return None
-    return max(candidates, key=lambda p: p.stat().st_mtime)
+    best_path, best_mtime = None, -1.0
+    scans = [(base / kind, _is_dated_report_json) for kind in ("weekly", "daily")]
+    scans.append((base, _is_legacy_report_json))
+    # 单次 os.scandir 过滤文件名，DirEntry 缓存类型与 stat，胜出者才构造 Path
+    for folder, match in scans:
+        try:
+            it = os.scandir(folder)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if not match(entry.name) or not entry.is_file():
+                    continue
+                mtime = entry.stat().st_mtime
+                if mtime > best_mtime:
+                    best_path, best_mtime = entry.path, mtime
+    return Path(best_path) if best_path else None
+
+
+def _is_dated_report_json(name):
+    """weekly/daily 下的报告 JSON：*_报告.json、报告_*.json、报告.json"""
+    return name.endswith("_报告.json") or name == "报告.json" or (name.startswith("报告_") and name.endswith(".json"))
+
+
+def _is_legacy_report_json(name):
+    """output 根目录下的旧版 ESG投研*_*.json"""
+    return name.startswith("ESG投研") and name.endswith(".json") and "_" in name[5:-5]
 
 
 def list_output_files_in_subdir(subdir_rel, base_dir=None):
@@ -274,53 +360,63 @@ DOMAIN_MAP = {
 }
 
 
+# 领域占位符 -> 各领域替换值（导入时构建一次）；单个正则一次扫描完成替换
+_DOMAIN_PLACEHOLDER_RE = re.compile(r"\{DOMAIN(?:_CN|_EXAMPLE)?\}")
+_DOMAIN_REPLACEMENTS = {
+    domain: {
+        "{DOMAIN}": domain,
+        "{DOMAIN_CN}": info["cn"],
+        "{DOMAIN_EXAMPLE}": info["example"],
+    }
+    for domain, info in DOMAIN_MAP.items()
+}
+
+# 日期占位符 -> date_info 字段
+_DATE_PLACEHOLDERS = {
+    "上周（具体日期范围由系统自动填充）": "date_range_chinese",
+    "上周": "date_range_chinese",
+    "上周一至上周日": "date_range_chinese",
+    "{上周日期}": "date_range_chinese",
+    "{DATE_RANGE}": "date_range_chinese",
+    "{DATE_RANGE_CHINESE}": "date_range_chinese",
+    "{TIME_SCOPE}": "date_range_chinese",
+    "{START_DATE}": "start_date_chinese",
+    "{END_DATE}": "end_date_chinese",
+    "{START_DATE_CHINESE}": "start_date_chinese",
+    "{END_DATE_CHINESE}": "end_date_chinese",
+    "{START_DATE_ISO}": "start_date_iso",
+    "{END_DATE_ISO}": "end_date_iso",
+    "{DATE_RANGE_ISO}": "date_range_iso",
+    "{DATE_RANGE_COMPACT}": "date_range_compact",
+}
+# 周报/日报用语占位符 -> (周报用语, 日报用语)
+_REPORT_TYPE_PLACEHOLDERS = {
+    "{REPORT_TYPE_CN}": ("周报", "日报"),
+    "{PERIOD_PHRASE}": ("过去一周", "当日"),
+    "{THIS_PERIOD}": ("本周", "当日"),
+}
+# 长的优先匹配，保证「上周（具体日期范围由系统自动填充）」「上周一至上周日」整体替换而不是只换掉「上周」
+_DATE_PLACEHOLDER_RE = re.compile("|".join(
+    re.escape(k) for k in sorted((*_DATE_PLACEHOLDERS, *_REPORT_TYPE_PLACEHOLDERS), key=len, reverse=True)
+))
+
+
 def replace_domain_placeholders(text, domain):
     """
     替换章节研究/润色提示词中的领域占位符。
     domain: "E" | "S" | "G"
     占位符：{DOMAIN} -> E/S/G, {DOMAIN_CN} -> 环境/社会/治理, {DOMAIN_EXAMPLE} -> 该领域示例句
     """
-    if domain not in DOMAIN_MAP:
+    replacements = _DOMAIN_REPLACEMENTS.get(domain)
+    if replacements is None:
         return text
-    info = DOMAIN_MAP[domain]
-    replacements = {
-        "{DOMAIN}": domain,
-        "{DOMAIN_CN}": info["cn"],
-        "{DOMAIN_EXAMPLE}": info["example"],
-    }
-    result = text
-    for placeholder, replacement in replacements.items():
-        result = result.replace(placeholder, replacement)
-    return result
+    return _DOMAIN_PLACEHOLDER_RE.sub(lambda m: replacements[m.group(0)], text)
 
 
 def replace_date_placeholders(text, date_info):
-    """替换文本中的所有日期与报告类型占位符（含周报/日报维度）"""
-    report_type = date_info.get("report_type", "weekly")
-    is_weekly = report_type == "weekly"
-    replacements = {
-        # 日期范围
-        "上周（具体日期范围由系统自动填充）": date_info["date_range_chinese"],
-        "上周": date_info["date_range_chinese"],
-        "上周一至上周日": date_info["date_range_chinese"],
-        "{上周日期}": date_info["date_range_chinese"],
-        "{DATE_RANGE}": date_info["date_range_chinese"],
-        "{DATE_RANGE_CHINESE}": date_info["date_range_chinese"],
-        "{TIME_SCOPE}": date_info["date_range_chinese"],
-        "{START_DATE}": date_info["start_date_chinese"],
-        "{END_DATE}": date_info["end_date_chinese"],
-        "{START_DATE_CHINESE}": date_info["start_date_chinese"],
-        "{END_DATE_CHINESE}": date_info["end_date_chinese"],
-        "{START_DATE_ISO}": date_info["start_date_iso"],
-        "{END_DATE_ISO}": date_info["end_date_iso"],
-        "{DATE_RANGE_ISO}": date_info["date_range_iso"],
-        "{DATE_RANGE_COMPACT}": date_info["date_range_compact"],
-        # 周报/日报用语（根据 report_type 替换）
-        "{REPORT_TYPE_CN}": "周报" if is_weekly else "日报",
-        "{PERIOD_PHRASE}": "过去一周" if is_weekly else "当日",
-        "{THIS_PERIOD}": "本周" if is_weekly else "当日",
-    }
-    result = text
-    for placeholder, replacement in replacements.items():
-        result = result.replace(placeholder, replacement)
-    return result
+    """替换文本中的所有日期与报告类型占位符（含周报/日报维度），单次正则扫描完成"""
+    is_weekly = date_info.get("report_type", "weekly") == "weekly"
+    replacements = {k: date_info[field] for k, field in _DATE_PLACEHOLDERS.items()}
+    for k, (weekly_text, daily_text) in _REPORT_TYPE_PLACEHOLDERS.items():
+        replacements[k] = weekly_text if is_weekly else daily_text
+    return _DATE_PLACEHOLDER_RE.sub(lambda m: replacements[m.group(0)], text)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Word / PPT 填充共用的 zip 与目录遍历工具：
+原样拷贝 zip 条目的压缩数据（不解压、不重新 DEFLATE），以及基于 os.scandir 的递归遍历。
+"""
+import copy
+import os
+import struct
+
+# zip 本地文件头固定部分长度，及其中文件名/扩展字段长度的偏移
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP_LOCAL_NAME_LEN_OFFSET = 26
+# general purpose flag：加密位、数据描述符位（CRC/大小写在数据之后）
+ZIP_FLAG_ENCRYPTED = 0x01
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def iter_files(root):
+    """
+    递归列出目录下所有文件的 os.DirEntry（自带类型信息与 stat 结果，调用方无需再 os.stat）。
+    无法读取的目录、遍历中途消失的条目直接跳过，不影响其余部分。
+    """
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                yield from iter_files(entry.path)
+            else:
+                yield entry
+
+
+def can_copy_raw(dst):
+    """目标 ZipFile 是否具备原样拷贝压缩数据所需的内部接口（不同 Python 版本兜底）。"""
+    return all(hasattr(dst, a) for a in ('_writecheck', 'filelist', 'NameToInfo', 'start_dir'))
+
+
+def copy_member_raw(src, dst, info):
+    """
+    将 src 中的条目按原压缩数据直接拷贝到 dst（不解压、不重新 DEFLATE），CRC/大小沿用源条目。
+    仅用于未加密条目。
+    """
+    fp = src.fp
+    fp.seek(info.header_offset)
+    header = fp.read(ZIP_LOCAL_HEADER_SIZE)
+    name_len, extra_len = struct.unpack('<HH', header[ZIP_LOCAL_NAME_LEN_OFFSET:ZIP_LOCAL_HEADER_SIZE])
+    fp.seek(name_len + extra_len, 1)
+    raw = fp.read(info.compress_size)
+    zinfo = copy.copy(info)
+    # CRC 与大小已知，直接写进本地文件头，不再附带数据描述符
+    zinfo.flag_bits &= ~ZIP_FLAG_DATA_DESCRIPTOR
+    dst._writecheck(zinfo)
+    zinfo.header_offset = dst.fp.tell()
+    dst.fp.write(zinfo.FileHeader())
+    dst.fp.write(raw)
+    dst.filelist.append(zinfo)
+    dst.NameToInfo[zinfo.filename] = zinfo
+    dst.start_dir = dst.fp.tell()
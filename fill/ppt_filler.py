@@ -4,8 +4,9 @@
 PPT 模板填充：按 JSON 替换 {{占位符}}（与 Word 一致，另增 {{报告日期}}）。
 优先 python-pptx（run 级替换 + <a:br/> 换行），无依赖时回退 XML 解包/替换/打包。
 """
+import functools
+import io
 import re
-import shutil
 import zipfile
 from pathlib import Path
 
@@ -14,10 +15,38 @@ try:
 except ImportError:
     find_latest_report_json = None
 
+from ._zip_utils import iter_files, can_copy_raw, copy_member_raw, ZIP_FLAG_ENCRYPTED
 from .word_filler import load_json_report, build_replacements
 
-
+# 逐页/逐 run 反复使用的正则，模块级预编译
+_PH_RE = re.compile(r"\{\{(.*?)\}\}", re.DOTALL)
+_RUN_PH_RE = re.compile(r"\{\{[^}]*\}\}")
+_TAG_RE = re.compile(r"<[^>]+>")
+_MULTI_NL_RE = re.compile(r"\n{2,}")
+_NL_RE = re.compile(r"\n+")
+_BR = "</a:t><a:br/><a:t>"
+_BR_RUN_RE = re.compile(r"(</a:t><a:br/><a:t>){2,}")
+_LEADING_BR_RE = re.compile(r"^(</a:t><a:br/><a:t>)+")
+_TRAILING_BR_RE = re.compile(r"(</a:t><a:br/><a:t>)+$")
+# 空 a:t（可带一个换行 + 空 a:t）→ 单个空格 a:t，一次扫描完成
+_EMPTY_AT_RE = re.compile(r"<a:t></a:t>(?:<a:br/><a:t></a:t>)?")
+_NEWS_PH_RE = re.compile(r"^(环境|社会|治理)新闻(标题|内容)\d+$")
+_SLIDE_COUNT_RE = re.compile(r"<Slides>(\d+)</Slides>")
+
+# DrawingML 文本：XML 特殊字符转义，非法控制字符（保留 \t \n \r）替换为空格，一次 translate 完成
+_PPTX_TEXT_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&apos;",
+    **{chr(c): " " for c in range(0x20) if c not in (0x09, 0x0A, 0x0D)},
+})
+
+
+@functools.lru_cache(maxsize=None)
 def _have_pptx():
+    """python-pptx 是否可用（进程内只尝试导入一次）。"""
     try:
         __import__("pptx")
         return True
@@ -25,11 +54,29 @@ def _have_pptx():
         return False
 
 
+@functools.lru_cache(maxsize=None)
 def _default_template_path():
+    """默认模板路径（进程内只探测一次文件系统）。"""
     p = Path("templates/ESG研报模板.pptx")
     return p if p.exists() else Path("ESG研报模板.pptx")
 
 
+def _find_latest_report_json_under(root):
+    """单次 os.scandir 递归遍历找出 root 下最新的 *_报告.json，无则返回 None"""
+    best, best_mtime = None, -1.0
+    for entry in iter_files(root):
+        if not entry.name.endswith("_报告.json"):
+            continue
+        # 遍历期间被删除等单个条目的错误只跳过该条目
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        if mtime > best_mtime:
+            best, best_mtime = entry.path, mtime
+    return Path(best) if best else None
+
+
 def _date_part_from_stem(stem):
     if stem.endswith("_报告"):
         return stem[:-3]
@@ -38,19 +85,11 @@ def _date_part_from_stem(stem):
     return stem
 
 
-def _pptx_zip_order(path, temp_dir):
-    """打包 pptx 时文件顺序：Content_Types → _rels → docProps → ppt。"""
-    rel = path.relative_to(temp_dir)
-    p0 = rel.parts[0] if rel.parts else ""
-    prio = 0 if p0 == "[Content_Types].xml" else 1 if p0 == "_rels" else 2 if p0 == "docProps" else 3 if p0 == "ppt" else 4
-    return (prio, str(rel))
-
-
 def _norm_val(val):
     if not isinstance(val, str):
         val = str(val) if val is not None else ""
     val = val.strip("\n\r \t")
-    return re.sub(r"\n{2,}", "\n", val)
+    return _MULTI_NL_RE.sub("\n", val)
 
 
 def _val_to_pptx_text(val):
@@ -60,14 +99,6 @@ def _val_to_pptx_text(val):
     return _norm_val(val) if isinstance(val, str) else _norm_val(str(val))
 
 
-def _escape_xml(text):
-    """转义 XML 文本/属性中的特殊字符。"""
-    if not text:
-        return ""
-    s = str(text)
-    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;").replace("'", "&apos;")
-
-
 def _insert_line_breaks_after_run(para, after_run, lines_after_first):
     """在 after_run 后插入 <a:br/> 和新 run，使「资料来源」等单独成行。"""
     if not lines_after_first:
@@ -77,31 +108,36 @@ def _insert_line_breaks_after_run(para, after_run, lines_after_first):
         from copy import deepcopy
     except ImportError:
         return
-    p_el = para._element
     r_el = after_run._r
     ns = "http://schemas.openxmlformats.org/drawingml/2006/main"
 
-    def make_br():
-        return parse_xml(f'<a:br xmlns:a="{ns}"/>')
+    # <a:br/> 与新 run 模板各只解析一次，逐行 deepcopy；文本直接赋给 a:t（由 lxml 负责转义），免去逐行拼串再解析
+    br_template = parse_xml(f'<a:br xmlns:a="{ns}"/>')
+    run_template = parse_xml(f'<a:r xmlns:a="{ns}"><a:t></a:t></a:r>')
+    rPr = r_el.find(f"{{{ns}}}rPr")
+    if rPr is not None:
+        run_template.insert(0, deepcopy(rPr))
+    t_tag = f"{{{ns}}}t"
 
     def make_run(text):
-        rPr = r_el.find(f"{{{ns}}}rPr")
-        r_el_str = f'<a:r xmlns:a="{ns}"><a:t>{_escape_xml(text)}</a:t></a:r>'
-        run_el = parse_xml(r_el_str)
-        if rPr is not None:
-            run_el.insert(0, deepcopy(rPr))
+        run_el = deepcopy(run_template)
+        run_el.find(t_tag).text = text
         return run_el
 
-    idx = list(p_el).index(r_el)
+    # 沿兄弟节点逐个 addnext，无需计算 run 在段落中的下标
+    cur = r_el
     for line in lines_after_first:
-        p_el.insert(idx + 1, make_br())
-        idx += 1
-        p_el.insert(idx + 1, make_run(line))
-        idx += 1
+        br_el = deepcopy(br_template)
+        cur.addnext(br_el)
+        cur = make_run(line)
+        br_el.addnext(cur)
 
 
 def _replace_in_paragraph(para, replacements):
-    """Run 级占位符替换；若替换值含 \\n 则插入 <a:br/> + 新 run 实现换行。"""
+    """
+    Run 级占位符替换；若替换值含 \\n 则插入 <a:br/> + 新 run 实现换行。
+    replacements 的值须已经 _val_to_pptx_text 规范（见 _fill_via_pptx）。
+    """
     runs = list(para.runs)
     if not runs:
         return
@@ -111,8 +147,8 @@ def _replace_in_paragraph(para, replacements):
         if "{{" not in text or "}}" not in text:
             continue
         for ph, val in replacements.items():
-            text = text.replace("{{" + ph + "}}", _val_to_pptx_text(val))
-        text = re.sub(r"\{\{[^}]*\}\}", " ", text)
+            text = text.replace("{{" + ph + "}}", val)
+        text = _RUN_PH_RE.sub(" ", text)
         if "\n" in text:
             lines = [s if s.strip() else " " for s in text.split("\n")]
             run.text = lines[0]
@@ -121,31 +157,34 @@ def _replace_in_paragraph(para, replacements):
             run.text = text
         break
 
+    # 跨 run 占位符：runs/texts/full 只在插入换行（run 结构变化）后重建，
+    # 普通替换只更新受影响 run 的文本，并从本次位置继续查找（其前不可能再出现 {{）
     runs = list(para.runs)
-    full = "".join(r.text for r in runs)
-    while "{{" in full and "}}" in full:
-        start = full.index("{{")
-        end = full.find("}}", start) + 2
-        if end <= start:
+    texts = [r.text for r in runs]
+    full = "".join(texts)
+    search_from = 0
+    while True:
+        start = full.find("{{", search_from)
+        if start == -1:
             break
-        ph_name = re.sub(r"<[^>]+>", "", full[start + 2 : end - 2]).strip()
-        val = replacements.get(ph_name) if ph_name else None
-        if val is not None:
-            val = _val_to_pptx_text(val)
-        else:
-            val = " "
+        end = full.find("}}", start)
+        if end == -1:
+            break
+        end += 2
+        ph_name = _TAG_RE.sub("", full[start + 2 : end - 2]).strip()
+        val = replacements.get(ph_name, " ") if ph_name else " "
 
         pos = 0
         run_ranges = []
-        for r in runs:
-            run_ranges.append((r, pos, pos + len(r.text)))
-            pos += len(r.text)
+        for r, t in zip(runs, texts):
+            run_ranges.append((r, pos, pos + len(t)))
+            pos += len(t)
 
         i0 = next(i for i, (_, a, b) in enumerate(run_ranges) if a <= start < b)
         i1 = next(i for i, (_, a, b) in enumerate(run_ranges) if a < end <= b)
         r0, s0, e0 = run_ranges[i0]
         r1, s1, e1 = run_ranges[i1]
-        prefix, suffix = full[s0:start], full[end:e1] if i0 == i1 else full[end:e1]
+        prefix, suffix = full[s0:start], full[end:e1]
         if "\n" not in val:
             if i0 == i1:
                 r0.text = prefix + val + suffix
@@ -154,25 +193,32 @@ def _replace_in_paragraph(para, replacements):
                 for i in range(i0 + 1, i1):
                     run_ranges[i][0].text = ""
                 r1.text = suffix
+            for i in range(i0, i1 + 1):
+                texts[i] = runs[i].text
+            full = "".join(texts)
+            search_from = start
+            continue
+
+        lines = [s if s.strip() else " " for s in val.split("\n")]
+        if i0 == i1:
+            r0.text = prefix + lines[0]
+            rest = lines[1:]
+            if rest:
+                last = rest[-1] + suffix
+                _insert_line_breaks_after_run(para, r0, rest[:-1] + [last])
+            elif suffix:
+                _insert_line_breaks_after_run(para, r0, [suffix])
         else:
-            lines = [s if s.strip() else " " for s in val.split("\n")]
-            if i0 == i1:
-                r0.text = prefix + lines[0]
-                rest = lines[1:]
-                if rest:
-                    last = rest[-1] + suffix
-                    _insert_line_breaks_after_run(para, r0, rest[:-1] + [last])
-                elif suffix:
-                    _insert_line_breaks_after_run(para, r0, [suffix])
-            else:
-                r0.text = prefix + lines[0]
-                for i in range(i0 + 1, i1):
-                    run_ranges[i][0].text = ""
-                r1.text = suffix
-                if lines[1:]:
-                    _insert_line_breaks_after_run(para, r0, lines[1:])
+            r0.text = prefix + lines[0]
+            for i in range(i0 + 1, i1):
+                run_ranges[i][0].text = ""
+            r1.text = suffix
+            if lines[1:]:
+                _insert_line_breaks_after_run(para, r0, lines[1:])
         runs = list(para.runs)
-        full = "".join(r.text for r in runs)
+        texts = [r.text for r in runs]
+        full = "".join(texts)
+        search_from = 0
 
 
 def _process_shape(shape, replacements):
@@ -189,63 +235,64 @@ def _process_shape(shape, replacements):
             _process_shape(s, replacements)
 
 
-def _slide_xml_has_no_content(xml_content):
-    """幻灯片 XML 中所有 a:t 文本为空或仅空白则视为无内容。"""
-    text = "".join(re.findall(r"<a:t>([^<]*)</a:t>", xml_content))
-    return not text.strip()
+def _process_part(part, replacements):
+    """
+    对幻灯片/版式/母版做占位符替换：一次 XPath 取出文本含 {{ 的全部 a:p（含组合形状、表格单元格），
+    直接包装成段落处理，不再逐形状递归构造 python-pptx 包装对象。
+    """
+    try:
+        from pptx.text.text import _Paragraph
+        paragraphs = part._element.xpath(".//a:p[contains(., '{{')]")
+    except (ImportError, AttributeError):
+        for shape in part.shapes:
+            _process_shape(shape, replacements)
+        return
+    for p_el in paragraphs:
+        _replace_in_paragraph(_Paragraph(p_el, None), replacements)
 
 
-def _delete_empty_slides_from_pptx(pptx_path):
-    """从已保存的 pptx 中删除无内容幻灯片（解包→删幻灯→重打包）。"""
-    pptx_path = Path(pptx_path)
-    temp_dir = pptx_path.parent / ("_temp_ppt_trim_" + pptx_path.stem)
-    out_temp = None
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
-    temp_dir.mkdir(parents=True)
+def _drop_empty_slides(prs):
+    """
+    保存前在内存中删除无内容幻灯片（所有 a:t 文本为空或仅空白），并同步 docProps/app.xml 的幻灯片数，
+    省去保存后再解包→删幻灯→重打包的一整轮读写。
+    """
+    sld_id_lst = prs.slides._sldIdLst
+    removed = 0
+    for sld_id in list(sld_id_lst):
+        r_id = sld_id.rId
+        slide_el = prs.part.related_part(r_id)._element
+        if "".join(slide_el.xpath(".//a:t/text()")).strip():
+            continue
+        sld_id_lst.remove(sld_id)
+        prs.part.drop_rel(r_id)
+        removed += 1
+    if not removed:
+        return
     try:
-        with zipfile.ZipFile(pptx_path, "r") as zf:
-            zf.extractall(temp_dir)
-        slides_dir = temp_dir / "ppt" / "slides"
-        to_delete = []
-        for xml_file in sorted(slides_dir.glob("slide*.xml"), key=lambda p: int(re.search(r"(\d+)", p.name).group(1))):
-            try:
-                content = xml_file.read_text(encoding="utf-8")
-                if _slide_xml_has_no_content(content):
-                    to_delete.append(xml_file)
-            except Exception:
-                continue
-        _remove_slides(temp_dir, to_delete)
-        out_temp = pptx_path.parent / (pptx_path.stem + "_out.pptx")
-        with zipfile.ZipFile(out_temp, "w", zipfile.ZIP_DEFLATED) as zf:
-            for f in sorted((x for x in temp_dir.rglob("*") if x.is_file()), key=lambda x: _pptx_zip_order(x, temp_dir)):
-                zf.write(f, f.relative_to(temp_dir))
-        out_temp.replace(pptx_path)
-    finally:
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
-        if out_temp is not None and out_temp.exists():
-            try:
-                out_temp.unlink()
-            except Exception:
-                pass
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+        app_part = prs.part.package.part_related_by(RT.EXTENDED_PROPERTIES)
+        app = app_part.blob.decode("utf-8")
+    except Exception:
+        return
+    app_part.blob = _SLIDE_COUNT_RE.sub(
+        lambda m: f"<Slides>{max(0, int(m.group(1)) - removed)}</Slides>", app
+    ).encode("utf-8")
 
 
-def _fill_via_pptx(template_path, output_path, replacements):
-    """使用 python-pptx 做 run 级替换并保存，删除无内容幻灯。"""
+def _fill_via_pptx(template, output_path, replacements):
+    """使用 python-pptx 做 run 级替换并保存，删除无内容幻灯。template 为模板路径或二进制文件对象。"""
     from pptx import Presentation
-    prs = Presentation(str(template_path))
+    # 替换值每次调用只规范一次，而非每个 run × 每个占位符
+    replacements = {ph: _val_to_pptx_text(val) for ph, val in replacements.items()}
+    prs = Presentation(str(template) if isinstance(template, Path) else template)
     for slide in prs.slides:
-        for shape in slide.shapes:
-            _process_shape(shape, replacements)
+        _process_part(slide, replacements)
     for layout in prs.slide_layouts:
-        for shape in layout.shapes:
-            _process_shape(shape, replacements)
+        _process_part(layout, replacements)
     for master in prs.slide_masters:
-        for shape in master.shapes:
-            _process_shape(shape, replacements)
+        _process_part(master, replacements)
+    _drop_empty_slides(prs)
     prs.save(str(output_path))
-    _delete_empty_slides_from_pptx(output_path)
     return True
 
 
@@ -265,86 +312,65 @@ def _to_pptx_text(text):
     """DrawingML 安全文本：控制字符替换、转义、换行 → </a:t><a:br/><a:t>。"""
     if not isinstance(text, str):
         text = str(text)
-    text = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", " ", text)
-    text = _escape_xml(text).strip("\n\r \t")
+    text = text.translate(_PPTX_TEXT_TABLE).strip("\n\r \t")
     if not text:
         return " "
-    text = re.sub(r"\n{2,}", "\n", text)
-    return text.replace("\n", "</a:t><a:br/><a:t>")
-
-
-def _replace_in_xml(xml_content, placeholder, replacement):
-    """占位符替换：先字面 {{name}}，否则扫描 {{...}} 整段替换。"""
-    repl = _to_pptx_text(replacement)
-    ph_text = "{{" + placeholder + "}}"
-    if ph_text in xml_content:
-        return xml_content.replace(ph_text, repl), True
-    i = 0
-    while i < len(xml_content) - 1:
-        if xml_content[i : i + 2] != "{{":
-            i += 1
-            continue
-        depth, pos, end = 0, i + 2, -1
-        while pos < len(xml_content) - 1:
-            if xml_content[pos : pos + 2] == "}}":
-                if depth == 0:
-                    end = pos + 2
-                    break
-                depth -= 1
-            elif xml_content[pos : pos + 2] == "{{":
-                depth += 1
-            pos += 1
-        if end > 0:
-            inner = re.sub(r"<[^>]+>", "", xml_content[i + 2 : end - 2])
-            if placeholder in inner or inner.strip() == placeholder:
-                return xml_content[:i] + repl + xml_content[end:], True
-        i = end + 2 if end > 0 else i + 1
-    return xml_content, False
+    return _NL_RE.sub(_BR, text)
+
+
+def _replace_all_in_xml(xml_content, rendered):
+    """
+    单次扫描替换全部占位符：每个 {{...}}（可能被拆成多个 run、内部夹带标签）去标签后按名称查表，
+    命中则换成 DrawingML 文本，未命中原样保留（交给 _clear_remaining_placeholders）。
+    rendered 为 {占位符名: 已经 _to_pptx_text 转换的文本}。返回 (新 XML, 是否有替换)。
+    """
+    changed = False
+
+    def _sub(m):
+        nonlocal changed
+        repl = rendered.get(_TAG_RE.sub("", m.group(1)).strip())
+        if repl is None:
+            return m.group(0)
+        changed = True
+        return repl
+
+    xml_content = _PH_RE.sub(_sub, xml_content)
+    return xml_content, changed
 
 
 def _clean_xml_newlines(xml_content):
-    xml_content = re.sub(r"(</a:t><a:br/><a:t>){2,}", "</a:t><a:br/><a:t>", xml_content)
-    xml_content = re.sub(r"<a:t></a:t><a:br/><a:t></a:t>", "<a:t> </a:t>", xml_content)
-    xml_content = re.sub(r"^(</a:t><a:br/><a:t>)+", "", xml_content)
-    xml_content = re.sub(r"(</a:t><a:br/><a:t>)+$", "", xml_content)
-    xml_content = re.sub(r"<a:t></a:t>", "<a:t> </a:t>", xml_content)
-    return xml_content
+    """
+    合并连续换行、去掉首尾换行、空 a:t 补空格。
+    连续换行与首尾换行极少出现，先用子串判断再跑正则，常见情况只有一次 _EMPTY_AT_RE 扫描。
+    """
+    if _BR + _BR in xml_content:
+        xml_content = _BR_RUN_RE.sub(_BR, xml_content)
+    if xml_content.startswith(_BR):
+        xml_content = _LEADING_BR_RE.sub("", xml_content)
+    if xml_content.endswith(_BR) or xml_content.endswith(_BR + "\n"):
+        xml_content = _TRAILING_BR_RE.sub("", xml_content)
+    return _EMPTY_AT_RE.sub("<a:t> </a:t>", xml_content)
 
 
 def _clear_remaining_placeholders(xml_content, used):
-    i = 0
-    while i < len(xml_content) - 3:
-        if xml_content[i : i + 2] != "{{":
-            i += 1
-            continue
-        end = xml_content.find("}}", i + 2)
-        if end == -1:
-            i += 1
-            continue
-        name = re.sub(r"<[^>]+>", "", xml_content[i + 2 : end]).strip()
-        if name and name not in used and xml_content[i : end + 2] == "{{" + name + "}}":
-            xml_content = xml_content[:i] + " " + xml_content[end + 2 :]
-            i += 1
-            continue
-        i = end + 2
-    return xml_content
+    """未替换且未被拆分的 {{名称}} 清为空格；夹带标签或空白的跨 run 占位符原样保留。"""
+    def _sub(m):
+        inner = m.group(1)
+        name = _TAG_RE.sub("", inner).strip()
+        if name and name not in used and inner == name:
+            return " "
+        return m.group(0)
+
+    return _PH_RE.sub(_sub, xml_content)
 
 
 def _extract_placeholders(xml_content):
+    """XML 中全部占位符名称（去标签、去首尾空白）。"""
     out = set()
-    i = 0
-    while i < len(xml_content) - 1:
-        if xml_content[i : i + 2] != "{{":
-            i += 1
-            continue
-        pos = xml_content.find("}}", i + 2)
-        if pos == -1:
-            i += 1
-            continue
-        inner = re.sub(r"<[^>]+>", "", xml_content[i + 2 : pos]).strip()
+    for m in _PH_RE.finditer(xml_content):
+        inner = _TAG_RE.sub("", m.group(1)).strip()
         if inner:
             out.add(inner)
-        i = pos + 2
     return out
 
 
@@ -352,92 +378,127 @@ def _is_empty_news_slide(xml_content, used_placeholders):
     phs = _extract_placeholders(xml_content)
     if not phs or any(p in used_placeholders for p in phs):
         return False
-    return all(re.match(r"^(环境|社会|治理)新闻(标题|内容)\d+$", p) for p in phs)
+    return all(_NEWS_PH_RE.match(p) for p in phs)
 
 
-def _remove_slides(temp_dir, slide_files):
-    if not slide_files:
-        return
-    slides_dir = temp_dir / "ppt" / "slides"
-    pres_xml = temp_dir / "ppt" / "presentation.xml"
-    pres_rels = temp_dir / "ppt" / "_rels" / "presentation.xml.rels"
-    content_types = temp_dir / "[Content_Types].xml"
-    app_xml = temp_dir / "docProps" / "app.xml"
-    try:
-        rels_content = pres_rels.read_text(encoding="utf-8")
-    except Exception:
-        return
+@functools.lru_cache(maxsize=None)
+def _slide_rel_re(slide_name):
+    """presentation.xml.rels 中指向某张幻灯片的 Relationship（按文件名缓存编译结果）。"""
+    return re.compile(rf'<Relationship\s+Id="(rId\d+)"[^>]*Target="[^"]*{re.escape(slide_name)}"')
+
+
+def _slide_removal_edits(read_part, slide_names):
+    """
+    计算删除幻灯片所需的改动（纯字符串处理，不落盘）。
+    read_part(name) 按 zip 内路径返回 XML 文本，不存在时返回 None；slide_names 如 ["slide3.xml"]。
+    返回 (updates: {路径: 新文本}, drops: {需删除的路径})。
+    """
+    pres_name = "ppt/presentation.xml"
+    rels_name = "ppt/_rels/presentation.xml.rels"
+    rels_content = read_part(rels_name)
+    if rels_content is None:
+        return {}, set()
     rids = []
-    for f in slide_files:
-        m = re.search(
-            rf'<Relationship\s+Id="(rId\d+)"[^>]*Target="[^"]*{re.escape(f.name)}"',
-            rels_content,
-        )
+    for name in slide_names:
+        m = _slide_rel_re(name).search(rels_content)
         if m:
-            rids.append((m.group(1), f))
+            rids.append((m.group(1), name))
     if not rids:
-        return
-    pres = pres_xml.read_text(encoding="utf-8")
+        return {}, set()
+    pres = read_part(pres_name) or ""
     rels = rels_content
-    for r_id, f in rids:
+    drops = set()
+    for r_id, name in rids:
         pres = re.sub(rf'<p:sldId\s+[^>]*r:id="{re.escape(r_id)}"[^>]*/>\s*', "", pres)
         rels = re.sub(rf'<Relationship\s+Id="{re.escape(r_id)}"[^>]*/>\s*', "", rels, flags=re.DOTALL)
-        f.unlink(missing_ok=True)
-        (slides_dir / "_rels" / (f.name + ".rels")).unlink(missing_ok=True)
-    pres_xml.write_text(pres, encoding="utf-8")
-    pres_rels.write_text(rels, encoding="utf-8")
-    if content_types.exists():
-        ct = content_types.read_text(encoding="utf-8")
-        for _, f in rids:
-            ct = re.sub(rf'<Override\s+PartName="/ppt/slides/{re.escape(f.name)}"[^/]*/>\s*', "", ct)
-        content_types.write_text(ct, encoding="utf-8")
-    if app_xml.exists():
-        try:
-            app = app_xml.read_text(encoding="utf-8")
-            n = len(rids)
-            app = re.sub(r"<Slides>(\d+)</Slides>", lambda m: f"<Slides>{max(0, int(m.group(1)) - n)}</Slides>", app)
-            app_xml.write_text(app, encoding="utf-8")
-        except Exception:
-            pass
+        drops.add(f"ppt/slides/{name}")
+        drops.add(f"ppt/slides/_rels/{name}.rels")
+    updates = {pres_name: pres, rels_name: rels}
+    ct = read_part("[Content_Types].xml")
+    if ct is not None:
+        for _, name in rids:
+            ct = re.sub(rf'<Override\s+PartName="/ppt/slides/{re.escape(name)}"[^/]*/>\s*', "", ct)
+        updates["[Content_Types].xml"] = ct
+    app = read_part("docProps/app.xml")
+    if app is not None:
+        n = len(rids)
+        updates["docProps/app.xml"] = _SLIDE_COUNT_RE.sub(
+            lambda m: f"<Slides>{max(0, int(m.group(1)) - n)}</Slides>", app
+        )
+    return updates, drops
 
 
-def _fill_via_xml(template_path, output_path, replacements):
-    """解包 → 替换占位符与清理 → 删空幻灯 → 打包。"""
+def _is_fill_target(name):
+    """XML 回退路径需要做占位符替换的部件：幻灯片与版式。"""
+    return name.endswith(".xml") and (name.startswith("ppt/slides/slide") or name.startswith("ppt/slideLayouts/"))
+
+
+def _fill_via_xml(template, output_path, replacements):
+    """
+    zip 到 zip 单遍处理：幻灯片/版式在内存中替换占位符与清理，无内容的新闻页连同引用一并删除，
+    其余部件按模板原顺序原样写出，不再解包到临时目录。template 为模板路径或二进制文件对象。
+    """
     used = set(replacements.keys())
-    temp_dir = Path("temp_ppt_unpacked")
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
-    temp_dir.mkdir(parents=True)
-    with zipfile.ZipFile(template_path, "r") as zf:
-        zf.extractall(temp_dir)
-    slides_dir = temp_dir / "ppt" / "slides"
-    to_delete = []
-    for xml_file in temp_dir.rglob("*.xml"):
-        s = str(xml_file.relative_to(temp_dir)).replace("\\", "/")
-        if not (s.startswith("ppt/slides/slide") or s.startswith("ppt/slideLayouts/")) or not s.endswith(".xml"):
-            continue
-        try:
-            content = xml_file.read_text(encoding="utf-8")
-        except Exception:
-            continue
-        orig = content
-        changed = False
-        for ph, val in replacements.items():
-            content, ok = _replace_in_xml(content, ph, val)
-            if ok:
-                changed = True
-        content = _clean_xml_newlines(content)
-        is_content_slide = slides_dir.exists() and slides_dir in xml_file.parents and xml_file.name.startswith("slide") and xml_file.name.endswith(".xml")
-        if is_content_slide and not changed and _is_empty_news_slide(content, used):
-            to_delete.append(xml_file)
-        content = _clear_remaining_placeholders(content, used)
-        if content != orig:
-            xml_file.write_text(content, encoding="utf-8")
-    _remove_slides(temp_dir, to_delete)
-    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for f in sorted((x for x in temp_dir.rglob("*") if x.is_file()), key=lambda x: _pptx_zip_order(x, temp_dir)):
-            zf.write(f, f.relative_to(temp_dir))
-    shutil.rmtree(temp_dir)
+    # 转义/换行转换每个值只做一次，各幻灯片共用
+    rendered = {ph: _to_pptx_text(val) for ph, val in replacements.items()}
+    with zipfile.ZipFile(template, "r") as src:
+        infos = src.infolist()
+        texts = {}
+        updates = {}
+        to_delete = []
+        for info in infos:
+            name = info.filename
+            if not _is_fill_target(name):
+                continue
+            try:
+                raw = src.read(info)
+                # 不含占位符的部件（多数版式）不解码、不扫描，原样拷贝
+                if b"{{" not in raw:
+                    continue
+                content = raw.decode("utf-8")
+            except Exception:
+                continue
+            texts[name] = content
+            orig = content
+            content, changed = _replace_all_in_xml(content, rendered)
+            if changed:
+                # 多余/首尾换行与空 a:t 只会由替换值引入；无替换的部件保持模板原样
+                content = _clean_xml_newlines(content)
+            is_content_slide = name.startswith("ppt/slides/slide") and "/" not in name[len("ppt/slides/"):]
+            if is_content_slide and not changed and _is_empty_news_slide(content, used):
+                to_delete.append(name[len("ppt/slides/"):])
+            content = _clear_remaining_placeholders(content, used)
+            if content != orig:
+                updates[name] = content
+
+        def read_part(name):
+            if name in updates:
+                return updates[name]
+            if name in texts:
+                return texts[name]
+            try:
+                return src.read(name).decode("utf-8")
+            except Exception:
+                return None
+
+        drops = set()
+        if to_delete:
+            removal_updates, drops = _slide_removal_edits(read_part, to_delete)
+            updates.update(removal_updates)
+
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as dst:
+            raw_ok = can_copy_raw(dst)
+            for info in infos:
+                name = info.filename
+                if name in drops:
+                    continue
+                if name in updates:
+                    dst.writestr(info, updates[name].encode("utf-8"))
+                elif raw_ok and not info.flag_bits & ZIP_FLAG_ENCRYPTED:
+                    # 未改动部件（图片、主题等）直接拷贝压缩数据，省去解压 + 重新压缩
+                    copy_member_raw(src, dst, info)
+                else:
+                    dst.writestr(info, src.read(info))
     return True
 
 
@@ -455,8 +516,7 @@ def fill_ppt_template(json_path=None, template_path=None, output_path=None):
     if json_path is None:
         json_path = find_latest_report_json(output_dir) if find_latest_report_json else None
         if not json_path:
-            json_files = list(output_dir.glob("**/*_报告.json")) or list(Path(".").glob("**/*_报告.json"))
-            json_path = max(json_files, key=lambda p: p.stat().st_mtime) if json_files else None
+            json_path = _find_latest_report_json_under(output_dir) or _find_latest_report_json_under(".")
         if not json_path or not json_path.exists():
             print("错误：未找到 JSON 报告文件")
             return False, None
@@ -473,11 +533,13 @@ def fill_ppt_template(json_path=None, template_path=None, output_path=None):
         return False, None
     report_data = load_json_report(json_path)
     replacements = _build_ppt_replacements(report_data, max_news_per_section=8)
+    # 模板只读盘一次：python-pptx 与 XML 回退路径共用同一份字节
+    template_data = template_path.read_bytes()
     if _have_pptx():
         try:
-            _fill_via_pptx(template_path, output_path, replacements)
+            _fill_via_pptx(io.BytesIO(template_data), output_path, replacements)
             return True, output_path
         except Exception as e:
             print(f"[PPT] python-pptx 填充失败，回退 XML: {e}")
-    _fill_via_xml(template_path, output_path, replacements)
+    _fill_via_xml(io.BytesIO(template_data), output_path, replacements)
     return True, output_path
@@ -4,47 +4,123 @@
 Word 模板填充模块
 基于 JSON 格式的投研周报，填充 Word 模板中的格式化字符串
 """
+import contextlib
 import json
+import os
 import re
 import zipfile
-import shutil
 from pathlib import Path
 
+from ._zip_utils import can_copy_raw, copy_member_raw, ZIP_FLAG_ENCRYPTED
+
 try:
-    from core.utils import find_latest_report_json
+    from core.utils import find_latest_report_json, load_json
 except ImportError:
     find_latest_report_json = None
+    load_json = None
+
+try:
+    from report.report_formatter import normalize_source_block
+except ImportError:
+    normalize_source_block = None
+
+DOCUMENT_XML = 'word/document.xml'
+# docx 读写使用的缓冲区大小（1 MiB），减少 zip 读写时的系统调用次数
+_IO_BUFFER_SIZE = 1 << 20
+
+# {{...}} 占位符（可能被 Word 拆成多个 run，内部夹带 XML 标签）与 XML 标签
+_PH_RE = re.compile(r'\{\{(.*?)\}\}', re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_NL_RE = re.compile(r'\n+')
+# 填充后清理多余换行：连续 / 开头 / 结尾的 </w:t><w:br/><w:t>
+_BR = '</w:t><w:br/><w:t>'
+_EMPTY_BR = '<w:t></w:t><w:br/><w:t></w:t>'
+_BR_RUN_RE = re.compile(r'(</w:t><w:br/><w:t>){2,}')
+_LEADING_BR_RE = re.compile(r'^(</w:t><w:br/><w:t>)+')
+_TRAILING_BR_RE = re.compile(r'(</w:t><w:br/><w:t>)+$')
+# 模板中的章节中文名 -> 报告 JSON 中的章节键
+_SECTIONS = (
+    ('环境', 'environmental'),
+    ('社会', 'social'),
+    ('治理', 'governance'),
+)
+_XML_ESCAPE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&apos;',
+})
 
 
 def load_json_report(json_path):
-    """加载 JSON 格式的投研周报"""
+    """加载 JSON 格式的投研周报（core 可用时走 core.utils.load_json）"""
+    if load_json is not None:
+        return load_json(json_path)
     with open(json_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 
-def unpack_docx(docx_path, output_dir):
-    """解压 docx 文件"""
-    output_path = Path(output_dir)
-    if output_path.exists():
-        shutil.rmtree(output_path)
-    output_path.mkdir(parents=True, exist_ok=True)
+def _open_preallocated(path, size_hint):
+    """
+    以写模式打开输出文件，并在支持的平台（Linux 等）上用 posix_fallocate 预分配 size_hint 字节，
+    减少逐块追加时的 extent 分配；写完后须调用 truncate() 截掉未用到的预分配部分。
+    """
+    if not hasattr(os, 'posix_fallocate'):
+        # Windows 等平台：普通二进制写模式打开即可
+        return open(path, 'wb', buffering=_IO_BUFFER_SIZE)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    if size_hint > 0:
+        try:
+            os.posix_fallocate(fd, 0, size_hint)
+        except OSError:
+            pass
+    return os.fdopen(fd, 'wb', buffering=_IO_BUFFER_SIZE)
+
+
+@contextlib.contextmanager
+def _atomic_output(path, size_hint):
+    """
+    先写到同目录的 <path>.tmp（预分配 size_hint），成功后 os.replace 为目标文件；
+    中途出错则删除临时文件，目标文件保持原样。yield 的文件句柄同 _open_preallocated，写完须 truncate()。
+    """
+    tmp_path = f"{os.fspath(path)}.tmp"
+    try:
+        with _open_preallocated(tmp_path, size_hint) as fh:
+            yield fh
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_document_xml(docx_path):
+    """直接从 docx 中读取 word/document.xml 文本，无需解压到磁盘"""
     with zipfile.ZipFile(docx_path, 'r') as zip_ref:
-        zip_ref.extractall(output_path)
-    return output_path
+        return zip_ref.read(DOCUMENT_XML).decode('utf-8')
 
 
-def pack_docx(input_dir, output_docx):
-    """打包目录为 docx 文件"""
-    input_path = Path(input_dir)
-    output_path = Path(output_docx)
-    if output_path.exists():
-        output_path.unlink()
-    
-    with zipfile.ZipFile(output_docx, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
-        for file_path in sorted(input_path.rglob('*')):
-            if file_path.is_file():
-                arcname = file_path.relative_to(input_path)
-                zip_ref.write(file_path, arcname)
+def write_docx_with_document(template_docx, output_docx, xml_content):
+    """以模板 docx 为底写出新文件：其余条目原样拷贝（保持顺序与元信息），仅替换 word/document.xml"""
+    document_bytes = xml_content.encode('utf-8')
+    with open(template_docx, 'rb', buffering=_IO_BUFFER_SIZE) as src_fh, \
+            zipfile.ZipFile(src_fh, 'r') as src:
+        # 预估输出大小：模板大小 - 原正文压缩后大小 + 新正文（不压缩）大小
+        size_hint = os.fstat(src_fh.fileno()).st_size - src.getinfo(DOCUMENT_XML).compress_size + len(document_bytes)
+        with _atomic_output(output_docx, size_hint) as dst_fh:
+            with zipfile.ZipFile(dst_fh, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as dst:
+                raw_ok = can_copy_raw(dst)
+                for info in src.infolist():
+                    if info.filename == DOCUMENT_XML:
+                        # 填充后的正文不压缩（Word 接受混合压缩方式），省去最大条目的 DEFLATE 开销
+                        dst.writestr(info, document_bytes, compress_type=zipfile.ZIP_STORED)
+                    elif raw_ok and not info.flag_bits & ZIP_FLAG_ENCRYPTED:
+                        # 其余条目（图片等本就难以再压缩）直接拷贝压缩数据，不解压、不重新 DEFLATE
+                        copy_member_raw(src, dst, info)
+                    else:
+                        dst.writestr(info, src.read(info))
+            dst_fh.truncate()
 
 
 def convert_newlines_to_word_xml(text):
@@ -60,63 +136,35 @@ def convert_newlines_to_word_xml(text):
     if not isinstance(text, str):
         text = str(text)
     
-    # 先转义 XML 特殊字符
-    text = (text
-            .replace('&', '&amp;')
-            .replace('<', '&lt;')
-            .replace('>', '&gt;')
-            .replace('"', '&quot;')
-            .replace("'", '&apos;'))
+    # 先转义 XML 特殊字符（单次 translate）
+    text = text.translate(_XML_ESCAPE)
     
     # 去除开头和结尾的所有换行符、回车符和空白字符
     text = text.strip('\n\r \t')
     
-    # 将多个连续换行符（2个或更多）压缩为单个换行符
-    text = re.sub(r'\n{2,}', '\n', text)
-    
-    result = text.replace('\n', '</w:t><w:br/><w:t>')
-    
-    return result
+    # 将多个连续换行符压缩为单个换行符后转为 <w:br/>
+    return _NL_RE.sub('</w:t><w:br/><w:t>', text)
 
 
-def replace_placeholder_in_xml(xml_content, placeholder, replacement):
-    """在 XML 中替换占位符，处理可能被标签分割的情况"""
-    replacement_xml = convert_newlines_to_word_xml(replacement)
-    placeholder_text = f"{{{{{placeholder}}}}}"
-    
-    if placeholder_text in xml_content:
-        return xml_content.replace(placeholder_text, replacement_xml), True
-    
-    start_positions = []
-    i = 0
-    while i < len(xml_content) - 1:
-        if xml_content[i:i+2] == '{{':
-            start_positions.append(i)
-        i += 1
-    
-    for start_pos in reversed(start_positions):
-        depth = 0
-        pos = start_pos + 2
-        end_pos = -1
-        
-        while pos < len(xml_content) - 1:
-            if xml_content[pos:pos+2] == '}}':
-                if depth == 0:
-                    end_pos = pos + 2
-                    break
-                depth -= 1
-            elif xml_content[pos:pos+2] == '{{':
-                depth += 1
-            pos += 1
-        
-        if end_pos > 0:
-            placeholder_content = xml_content[start_pos+2:end_pos-2]
-            text_only = re.sub(r'<[^>]+>', '', placeholder_content)
-            if placeholder in text_only:
-                xml_content = xml_content[:start_pos] + replacement_xml + xml_content[end_pos:]
-                return xml_content, True
-    
-    return xml_content, False
+def replace_all_placeholders_in_xml(xml_content, replacements):
+    """
+    一次扫描完成全部占位符替换：命中 replacements 的 {{...}} 换成对应内容，
+    其余 {{...}} 直接删除。
+    返回 (新 XML, 已替换的占位符名集合)。
+    """
+    # 占位符名 -> 已转换的 Word XML；同一占位符多次出现时只转义一次
+    rendered = {}
+
+    def _sub(m):
+        name = _TAG_RE.sub('', m.group(1)).strip()
+        xml = rendered.get(name)
+        if xml is None:
+            if name not in replacements:
+                return ''
+            xml = rendered[name] = convert_newlines_to_word_xml(replacements[name])
+        return xml
+
+    return _PH_RE.sub(_sub, xml_content), set(rendered)
 
 
 def _normalize_news_content_for_output(text):
@@ -126,21 +174,31 @@ def _normalize_news_content_for_output(text):
     """
     if not text:
         return ""
-    try:
-        from report.report_formatter import normalize_source_block
-        text = normalize_source_block(str(text))
-    except Exception:
-        text = str(text)
+    text = str(text)
+    if normalize_source_block is not None:
+        try:
+            text = normalize_source_block(text)
+        except Exception:
+            pass
     text = text.strip('\n\r \t')
     idx = text.find("资料来源")
     if idx == -1:
-        return re.sub(r'\n{2,}', '\n', text)
+        return _NL_RE.sub('\n', text)
     before = text[:idx].strip()
     after = text[idx:]
-    before = re.sub(r'\n{2,}', '\n', before)
+    before = _NL_RE.sub('\n', before)
     return before + "\n\n" + after
 
 
+def _collapse_newlines(text):
+    """去首尾空白并将连续换行压成一个"""
+    text = text.strip('\n\r \t')
+    # 标题、日期等短文本通常没有连续换行，直接返回，不进正则
+    if '\n\n' not in text:
+        return text
+    return _NL_RE.sub('\n', text)
+
+
 def build_replacements(report_data, max_news_per_section=8):
     """构建替换字典"""
     replacements = {}
@@ -148,9 +206,7 @@ def build_replacements(report_data, max_news_per_section=8):
     def clean_text(text):
         if not text:
             return ""
-        text = str(text).strip('\n\r \t')
-        text = re.sub(r'\n{2,}', '\n', text)
-        return text
+        return _collapse_newlines(str(text))
     
     date_range = report_data['report_metadata']['report_period']['date_range']
     replacements['日期范围'] = clean_text(date_range)
@@ -158,20 +214,10 @@ def build_replacements(report_data, max_news_per_section=8):
     hotspot_focus = report_data['report_content']['hotspot_focus']
     replacements['热点聚焦'] = clean_text(hotspot_focus)
     
-    sections = {
-        '环境': 'environmental',
-        '社会': 'social',
-        '治理': 'governance'
-    }
-    
-    for section_name_cn, section_key in sections.items():
+    for section_name_cn, section_key in _SECTIONS:
         section_data = report_data['report_content'][section_key]
         replacements[f'{section_name_cn}章节标题'] = clean_text(section_data.get('section_title'))
-        news_items = section_data['news_items']
-        actual_count = len(news_items)
-        
-        for i in range(1, min(actual_count, max_news_per_section) + 1):
-            news = news_items[i - 1]
+        for i, news in enumerate(section_data['news_items'][:max_news_per_section], 1):
             replacements[f'{section_name_cn}新闻标题{i}'] = clean_text(news.get('title'))
             # 新闻内容：去掉 ---，并保留「资料来源」前换行，使资料来源及链接单独成行
             replacements[f'{section_name_cn}新闻内容{i}'] = _normalize_news_content_for_output(news.get('content'))
@@ -179,45 +225,43 @@ def build_replacements(report_data, max_news_per_section=8):
     return replacements
 
 
-def clean_remaining_placeholders(xml_content, used_placeholders):
-    """清理剩余的占位符"""
-    start_positions = []
-    i = 0
-    while i < len(xml_content) - 1:
-        if xml_content[i:i+2] == '{{':
-            start_positions.append(i)
-        i += 1
-    
-    for start_pos in reversed(start_positions):
-        depth = 0
-        pos = start_pos + 2
-        end_pos = -1
-        
-        while pos < len(xml_content) - 1:
-            if xml_content[pos:pos+2] == '}}':
-                if depth == 0:
-                    end_pos = pos + 2
-                    break
-                depth -= 1
-            elif xml_content[pos:pos+2] == '{{':
-                depth += 1
-            pos += 1
-        
-        if end_pos > 0:
-            placeholder_content = xml_content[start_pos+2:end_pos-2]
-            text_only = re.sub(r'<[^>]+>', '', placeholder_content)
-            is_used = False
-            for used_placeholder in used_placeholders:
-                if used_placeholder in text_only:
-                    is_used = True
-                    break
-            
-            if not is_used:
-                xml_content = xml_content[:start_pos] + xml_content[end_pos:]
-    
+def _clean_word_breaks(xml_content):
+    """
+    合并连续换行、删除空换行 run、去掉首尾换行。
+    convert_newlines_to_word_xml 已去除首尾换行并压缩连续换行，这些情况在填充结果中极少出现，
+    先做子串判断，命中才跑对应的正则/替换，通常整段 XML 不再被多次重写。
+    """
+    if _BR + _BR in xml_content:
+        xml_content = _BR_RUN_RE.sub(_BR, xml_content)
+    if _EMPTY_BR in xml_content:
+        xml_content = xml_content.replace(_EMPTY_BR, '')
+    if xml_content.startswith(_BR):
+        xml_content = _LEADING_BR_RE.sub('', xml_content)
+    if xml_content.endswith(_BR) or xml_content.endswith(_BR + '\n'):
+        xml_content = _TRAILING_BR_RE.sub('', xml_content)
     return xml_content
 
 
+def _find_latest_legacy_json(directory):
+    """单次 os.scandir 找出目录下最新的 ESG投研*_*.json（DirEntry.stat 复用扫描结果），无则返回 None"""
+    best, best_mtime = None, -1.0
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return None
+    with it:
+        for entry in it:
+            name = entry.name
+            if not (name.startswith('ESG投研') and name.endswith('.json') and '_' in name[5:-5]):
+                continue
+            if not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime
+            if mtime > best_mtime:
+                best, best_mtime = Path(entry.path), mtime
+    return best
+
+
 def fill_word_template(json_path=None, template_path=None, output_path=None):
     """
     填充 Word 模板的函数
@@ -243,8 +287,7 @@ def fill_word_template(json_path=None, template_path=None, output_path=None):
         if find_latest_report_json:
             json_path = find_latest_report_json(output_dir)
         else:
-            json_files = list(output_dir.glob("ESG投研*_*.json")) or list(Path(".").glob("ESG投研*_*.json"))
-            json_path = max(json_files, key=lambda p: p.stat().st_mtime) if json_files else None
+            json_path = _find_latest_legacy_json(output_dir) or _find_latest_legacy_json(Path("."))
         if not json_path or not json_path.exists():
             print("错误：未找到 JSON 报告文件（output/weekly|daily/报告_*.json 或旧版 output/*.json）")
             return False, None
@@ -287,43 +330,23 @@ def fill_word_template(json_path=None, template_path=None, output_path=None):
     replacements = build_replacements(report_data, max_news_per_section=8)
     print(f"   共 {len(replacements)} 个替换项")
     
-    print(f"\n3. 解压 Word 模板: {template_path}")
-    temp_dir = unpack_docx(template_path, "temp_template_unpacked")
-    
-    document_xml_path = temp_dir / "word" / "document.xml"
-    print(f"4. 读取 document.xml...")
-    with open(document_xml_path, 'r', encoding='utf-8') as f:
-        xml_content = f.read()
-    
-    print(f"\n5. 执行替换...")
-    replaced_count = 0
-    for placeholder, replacement in replacements.items():
-        xml_content, success = replace_placeholder_in_xml(xml_content, placeholder, replacement)
-        if success:
-            replaced_count += 1
-            print(f"   [OK] {{{{ {placeholder} }}}}")
-    
-    print(f"\n   共替换了 {replaced_count}/{len(replacements)} 个占位符")
-    
-    print(f"\n6. 清理多余的换行...")
-    xml_content = re.sub(r'(</w:t><w:br/><w:t>){2,}', '</w:t><w:br/><w:t>', xml_content)
-    xml_content = re.sub(r'<w:t></w:t><w:br/><w:t></w:t>', '', xml_content)
-    xml_content = re.sub(r'^(</w:t><w:br/><w:t>)+', '', xml_content)
-    xml_content = re.sub(r'(</w:t><w:br/><w:t>)+$', '', xml_content)
+    print(f"\n3. 读取 Word 模板中的 document.xml: {template_path}")
+    xml_content = read_document_xml(template_path)
     
-    print(f"\n7. 清理剩余的占位符...")
-    used_placeholders = set(replacements.keys())
-    xml_content = clean_remaining_placeholders(xml_content, used_placeholders)
+    print(f"\n4. 执行替换并清理剩余的占位符...")
+    xml_content, replaced = replace_all_placeholders_in_xml(xml_content, replacements)
+    # 逐项结果汇总后一次输出，避免每个占位符都单独写一次 stdout
+    ok_lines = [f"   [OK] {{{{ {placeholder} }}}}" for placeholder in replacements if placeholder in replaced]
+    if ok_lines:
+        print("\n".join(ok_lines))
     
-    print(f"8. 保存 document.xml...")
-    with open(document_xml_path, 'w', encoding='utf-8') as f:
-        f.write(xml_content)
+    print(f"\n   共替换了 {len(replaced)}/{len(replacements)} 个占位符")
     
-    print(f"\n9. 打包 Word 文件: {output_path}")
-    pack_docx(temp_dir, output_path)
+    print(f"\n5. 清理多余的换行...")
+    xml_content = _clean_word_breaks(xml_content)
     
-    print(f"10. 清理临时文件...")
-    shutil.rmtree(temp_dir)
+    print(f"\n6. 写出 Word 文件: {output_path}")
+    write_docx_with_document(template_path, output_path, xml_content)
     
     print(f"\n" + "=" * 60)
     print(f"完成！输出文件: {output_path}")
@@ -30,6 +30,7 @@ from core.progress import (
 )
 from report import save_raw_content, save_formatted_report
 from fill import fill_word_template, fill_ppt_template
+from fill.word_filler import load_json_report
 
 
 def main():
@@ -71,28 +72,29 @@ def main():
         safe_print(f"日期范围（ISO）：{date_info['date_range_iso']}\n")
 
         start_total()
-        pipeline = ResearchPipeline(config)
-        research_results = pipeline.stage1_research_parallel(date_info)
-        if not all(research_results.values()):
-            safe_print("\n警告：部分领域的研究失败，将使用可用结果继续处理")
-        completed_stages = end_stage("stage1", "Deep Research（E/S/G）", completed_stages)
-        write_progress("stage2", "润色（E/S/G）", completed_stages)
-        start_stage("stage2", "润色（E/S/G）")
-
-        current_stage_id, current_stage_label = "stage2", "润色（E/S/G）"
-        polished_results = pipeline.stage2_polish_parallel(research_results, date_info)
-        completed_stages = end_stage("stage2", "润色（E/S/G）", completed_stages)
-        write_progress("stage3", "热点聚焦", completed_stages)
-        start_stage("stage3", "热点聚焦")
-
-        current_stage_id, current_stage_label = "stage3", "热点聚焦"
-        hotspot_result = pipeline.stage3_hotspot_focus(polished_results, date_info)
-        completed_stages = end_stage("stage3", "热点聚焦", completed_stages)
-        write_progress("stage4", "合并报告", completed_stages)
-        start_stage("stage4", "合并报告")
-
-        current_stage_id, current_stage_label = "stage4", "合并报告"
-        final_result = pipeline.stage4_merge(polished_results, hotspot_result, date_info)
+        # 阶段 1–4 共用同一线程池；with 保证任一阶段抛错时也会关闭
+        with ResearchPipeline(config) as pipeline:
+            research_results = pipeline.stage1_research_parallel(date_info)
+            if not all(research_results.values()):
+                safe_print("\n警告：部分领域的研究失败，将使用可用结果继续处理")
+            completed_stages = end_stage("stage1", "Deep Research（E/S/G）", completed_stages)
+            write_progress("stage2", "润色（E/S/G）", completed_stages)
+            start_stage("stage2", "润色（E/S/G）")
+
+            current_stage_id, current_stage_label = "stage2", "润色（E/S/G）"
+            polished_results = pipeline.stage2_polish_parallel(research_results, date_info)
+            completed_stages = end_stage("stage2", "润色（E/S/G）", completed_stages)
+            write_progress("stage3", "热点聚焦", completed_stages)
+            start_stage("stage3", "热点聚焦")
+
+            current_stage_id, current_stage_label = "stage3", "热点聚焦"
+            hotspot_result = pipeline.stage3_hotspot_focus(polished_results, date_info)
+            completed_stages = end_stage("stage3", "热点聚焦", completed_stages)
+            write_progress("stage4", "合并报告", completed_stages)
+            start_stage("stage4", "合并报告")
+
+            current_stage_id, current_stage_label = "stage4", "合并报告"
+            final_result = pipeline.stage4_merge(polished_results, hotspot_result, date_info)
         completed_stages = end_stage("stage4", "合并报告", completed_stages)
         write_progress("stage5", "Word 与 PPT 填充", completed_stages)
         start_stage("stage5", "Word 与 PPT 填充")
@@ -118,8 +120,7 @@ def main():
         safe_print(f"JSON 报告：{formatted_filename}")
 
         try:
-            with open(formatted_filename, "r", encoding="utf-8") as f:
-                report_json = json.load(f)
+            report_json = load_json_report(formatted_filename)
             safe_print("\n报告元数据：")
             safe_print(json.dumps(report_json["report_metadata"], ensure_ascii=False, indent=2))
         except Exception as e:
@@ -2,15 +2,45 @@
 报告格式化模块
 包含解析章节内容、提取标题和热点聚焦等功能
 """
+import functools
 import re
 
+# 常用正则预编译，避免逐行调用时反复查 re 模块缓存
+_MULTI_BLANK_RE = re.compile(r'\n{3,}')
+_DASH_BEFORE_SOURCE_RE = re.compile(r'[\r\n\s]*\-+\s*资料来源')
+_SOURCE_AFTER_TEXT_RE = re.compile(r'([^\n\r])资料来源')
+_NL_BEFORE_SOURCE_RE = re.compile(r'\n+资料来源')
+_DASH_ONLY_RE = re.compile(r'^[\s\-]+$')
+_SOURCE_CITE_RE = re.compile(r'\[cite:\s*\d+')
+_SOURCE_PREFIXES = ('Sources', 'Source:', '资料来源', '[资料来源]', '[cite:')
+_SOURCE_MD_RE = re.compile(r'\[资料来源\]\((https?://[^\)]+)\)')
+_SOURCE_EN_RE = re.compile(r'Source:\s*\[([^\]]+)\]\((https?://[^\)]+)\)')
+_URL_RE = re.compile(r'(https?://[^\s\)]+)')
+_MD_HEADER_RE = re.compile(r'^#+\s*')
+_LEADING_DASH_RE = re.compile(r'^\-+\s*')
+_TRAILING_DASH_RE = re.compile(r'\-+\s*$')
+_TRAILING_DASH_LINE_RE = re.compile(r'\n?\-+\s*$')
+
+# parse_section_content 用到的关键词，放在模块级避免每段重新构造
+_SECTION_HEADER_KWS = ('# 环境', '# 社会', '# 治理', '环境（E）', '社会（S）', '治理（G）', '公司治理（G）')
+_SECTION_DYN_KWS = ('动态', '章节')
+_ESG_KWS = ('环境', '社会', '治理')
+_SECTION_TITLE_KWS = ('环境（E）', '社会（S）', '治理（G）', '公司治理')
+_HOTSPOT_KWS = ('热点聚焦', '核心摘要', '摘要', '周报开篇')
+_MD_MARK_TABLE = str.maketrans('', '', '#*')
+# 以这些词开头的短行视为正文而非标题
+_CONTENT_PREFIXES = ('在', '根据', '该', '这', '其', '文件', '此次', '此事', '从',
+                     'Sources', '资料来源', '[资料来源]', '工业和信息化部', '美国', '晶科', '中国天楹')
+
 
 def normalize_newlines(text):
     """规范化换行符：将 3 个及以上连续换行压成 2 个，保留 1 个空行；其余不变。"""
     if not text:
         return text
-    normalized = re.sub(r'\n{3,}', '\n\n', text)
-    return normalized.strip()
+    # 多数文本没有连续三个换行，只需 strip，不进正则
+    if '\n\n\n' not in text:
+        return text.strip()
+    return _MULTI_BLANK_RE.sub('\n\n', text).strip()
 
 
 def normalize_source_block(text):
@@ -22,26 +52,25 @@ def normalize_source_block(text):
     if not text or '资料来源' not in text:
         return text
     # 去掉紧挨在「资料来源」前的任意短线与空白（含 ---、----、---\n 等）
-    text = re.sub(r'[\r\n\s]*\-+\s*资料来源', '\n\n资料来源', text)
+    text = _DASH_BEFORE_SOURCE_RE.sub('\n\n资料来源', text)
     # 若「资料来源」紧接在非换行字符后，则插入空行
-    text = re.sub(r'([^\n\r])资料来源', r'\1\n\n资料来源', text)
+    text = _SOURCE_AFTER_TEXT_RE.sub(r'\1\n\n资料来源', text)
     # 将「资料来源」前的多个换行统一为两个（一段空行）
-    text = re.sub(r'\n+资料来源', '\n\n资料来源', text)
+    text = _NL_BEFORE_SOURCE_RE.sub('\n\n资料来源', text)
     # 去掉整行仅由短线/空格组成的行
-    lines = [L for L in text.split('\n') if not re.match(r'^[\s\-]+$', L.strip())]
+    lines = [L for L in text.split('\n') if not _DASH_ONLY_RE.match(L.strip())]
     text = '\n'.join(lines)
     return normalize_newlines(text)
 
 
 def is_source_line(text):
     """判断是否是资料来源行"""
-    text_lower = text.lower()
-    # 检查各种资料来源格式
+    # 检查各种资料来源格式（前缀与子串判断均在 C 层完成，正则仅在含 [cite: 时才跑）
     return (
-        text.startswith(('Sources', 'Source:', '资料来源', '[资料来源]', '[cite:')) or
+        text.startswith(_SOURCE_PREFIXES) or
         'vertexaisearch.cloud.google.com' in text or
         'grounding-api-redirect' in text or
-        re.search(r'\[cite:\s*\d+', text) is not None  # [cite: 1, 2, 3] 格式
+        ('[cite:' in text and _SOURCE_CITE_RE.search(text) is not None)  # [cite: 1, 2, 3] 格式
     )
 
 
@@ -54,17 +83,17 @@ def format_source_line(source_text):
         return "资料来源："
     
     # 处理 [资料来源](链接) 格式
-    match = re.search(r'\[资料来源\]\((https?://[^\)]+)\)', source_text)
+    match = _SOURCE_MD_RE.search(source_text)
     if match:
         return f"资料来源：{match.group(1)}"
     
     # 处理 Source: [网站](链接) 格式
-    match = re.search(r'Source:\s*\[([^\]]+)\]\((https?://[^\)]+)\)', source_text)
+    match = _SOURCE_EN_RE.search(source_text)
     if match:
         return f"资料来源：{match.group(2)}"
     
     # 处理包含链接的其他格式
-    match = re.search(r'(https?://[^\s\)]+)', source_text)
+    match = _URL_RE.search(source_text)
     if match:
         return f"资料来源：{match.group(1)}"
     
@@ -80,12 +109,14 @@ def extract_source_from_text(text):
     """从文本中提取资料来源并格式化为统一格式"""
     lines = text.split('\n')
     sources = []
+    seen = set()
     
     for line in lines:
         line_stripped = line.strip()
         if is_source_line(line_stripped):
             formatted_source = format_source_line(line_stripped)
-            if formatted_source and formatted_source not in sources:
+            if formatted_source and formatted_source not in seen:
+                seen.add(formatted_source)
                 sources.append(formatted_source)
     
     return '\n'.join(sources) if sources else None
@@ -107,40 +138,71 @@ def parse_section_content(section_text, domain_name):
     if not paragraphs:
         return []
     
+    # 同一段落/行会在多个分支里反复判断是否为资料来源，本次解析内按文本缓存结果
+    is_source = functools.lru_cache(maxsize=None)(is_source_line)
+    
     current_title = None
     current_content_parts = []
     pending_source = None  # 暂存的资料来源（可能在下一个段落）
     
-    for i, para in enumerate(paragraphs):
-        para_lines = [l.strip() for l in para.split('\n') if l.strip()]
-        if not para_lines:
-            continue
+    def finalize_news(title, content_parts):
+        """整理一条新闻的内容（保证资料来源在末尾）并追加到 news_items"""
+        nonlocal pending_source
+        if not (title and content_parts):
+            return
+        content = '\n'.join(content_parts).strip()
+        if not content:
+            return
+        
+        # 检查最后3行是否有资料来源。各部分都是去过空白的单行段落，
+        # content 按行拆分即 content_parts，直接取尾部，不再整段 split
+        if not is_source('\n'.join(content_parts[-3:])):
+            # 如果没有资料来源，尝试从内容中提取
+            extracted_source = extract_source_from_text(content)
+            if extracted_source:
+                # 从内容中移除资料来源，然后添加到末尾
+                content = '\n'.join(line for line in content_parts if not is_source(line)).strip()
+                if content:
+                    content = f"{content}\n{extracted_source}"
+            elif pending_source:
+                # 使用暂存的资料来源
+                content = f"{content}\n{pending_source}"
+                pending_source = None
         
-        first_line = para_lines[0]
+        if content:  # 确保有内容
+            news_items.append({
+                "title": title,
+                "content": content
+            })
+    
+    for para in paragraphs:
+        # 段落已按换行切分并去除首尾空白，每段恰好一行，无需再拆分
+        first_line = para
+        is_markdown_title = first_line.startswith('#')
         
         # 跳过章节标题行（必须同时包含"动态"或"章节"关键词）
         # 避免误跳过包含"环境"、"社会"、"治理"等词汇的新闻标题
-        if any(kw in first_line for kw in ['# 环境', '# 社会', '# 治理', '环境（E）', '社会（S）', '治理（G）', '公司治理（G）']):
-            if any(kw in first_line for kw in ['动态', '章节']):
+        if any(kw in first_line for kw in _SECTION_HEADER_KWS):
+            if any(kw in first_line for kw in _SECTION_DYN_KWS):
                 continue
         # 额外检查：如果是章节标题格式（如"# 投研周报：环境（E）"），也要跳过
-        if first_line.startswith('#') and ('投研周报' in first_line or '周报' in first_line):
-            if any(kw in first_line for kw in ['环境', '社会', '治理']):
+        if is_markdown_title and ('投研周报' in first_line or '周报' in first_line):
+            if any(kw in first_line for kw in _ESG_KWS):
                 continue
         
         # 移除Markdown格式标记
-        clean_first = re.sub(r'^#+\s*', '', first_line)  # 移除 ### 或 ##
+        clean_first = _MD_HEADER_RE.sub('', first_line)  # 移除 ### 或 ##
         clean_first = clean_first.replace('**', '').replace('*', '').strip()
         
         # 检查是否是资料来源行
-        if is_source_line(clean_first):
+        if is_source(clean_first):
             # 如果当前有新闻，将资料来源添加到内容末尾
             if current_title:
                 # 资料来源应该添加到当前新闻的内容末尾
                 if current_content_parts:
                     # 检查最后一部分是否已经是资料来源
                     last_part = current_content_parts[-1]
-                    if not is_source_line(last_part):
+                    if not is_source(last_part):
                         current_content_parts.append(para)
                 else:
                     current_content_parts.append(para)
@@ -153,94 +215,31 @@ def parse_section_content(section_text, domain_name):
         # 1. 是Markdown标题格式（###、## 或 # 开头）
         # 2. 或者长度较短（小于100字符）且不包含句号
         # 3. 不是以内容性词汇开头
-        is_markdown_title = first_line.startswith(('###', '##', '#'))
-        
         is_plain_title = (
             len(clean_first) < 100 and
             not clean_first.endswith('。') and
             not clean_first.endswith('.') and
-            not clean_first.startswith(('在', '根据', '该', '这', '其', '文件', '此次', '此事', '从', 'Sources', '资料来源', '[资料来源]', '工业和信息化部', '美国', '晶科', '中国天楹'))
+            not clean_first.startswith(_CONTENT_PREFIXES)
         )
         
         if (is_markdown_title or is_plain_title) and len(clean_first) > 5:
             # 遇到新标题，保存之前的新闻
-            if current_title and current_content_parts:
-                content = '\n'.join(current_content_parts).strip()
-                
-                # 检查内容末尾是否已有资料来源
-                if content:
-                    # 检查最后几行是否有资料来源
-                    content_lines = content.split('\n')
-                    has_source_at_end = False
-                    if len(content_lines) >= 1:
-                        last_few_lines = '\n'.join(content_lines[-3:])  # 检查最后3行
-                        if is_source_line(last_few_lines):
-                            has_source_at_end = True
-                    
-                    # 如果没有资料来源，尝试从内容中提取
-                    if not has_source_at_end:
-                        extracted_source = extract_source_from_text(content)
-                        if extracted_source:
-                            # 从内容中移除资料来源，然后添加到末尾
-                            content_lines_clean = []
-                            for line in content_lines:
-                                if not is_source_line(line):
-                                    content_lines_clean.append(line)
-                            content = '\n'.join(content_lines_clean).strip()
-                            if content:
-                                content = f"{content}\n{extracted_source}"
-                        elif pending_source:
-                            # 使用暂存的资料来源
-                            content = f"{content}\n{pending_source}"
-                            pending_source = None
-                    
-                    if content:  # 确保有内容
-                        news_items.append({
-                            "title": current_title,
-                            "content": content
-                        })
+            finalize_news(current_title, current_content_parts)
             
             # 开始新新闻
             current_title = clean_first
-            # 如果标题后面还有内容（同一段落内）
-            if len(para_lines) > 1:
-                remaining_lines = para_lines[1:]
-                # 检查剩余内容是否也是标题的一部分
-                second_line = remaining_lines[0] if remaining_lines else ""
-                if len(second_line) < 100 and not second_line.endswith('。') and not second_line.endswith('.'):
-                    # 可能是标题的延续
-                    current_title = f"{current_title} {second_line}"
-                    if len(remaining_lines) > 1:
-                        remaining_content = '\n'.join(remaining_lines[1:])
-                        # 检查剩余内容中是否有资料来源
-                        if is_source_line(remaining_content):
-                            pending_source = remaining_content
-                            current_content_parts = []
-                        else:
-                            current_content_parts = [remaining_content]
-                    else:
-                        current_content_parts = []
-                else:
-                    remaining_content = '\n'.join(remaining_lines)
-                    # 检查剩余内容中是否有资料来源
-                    if is_source_line(remaining_content):
-                        pending_source = remaining_content
-                        current_content_parts = []
-                    else:
-                        current_content_parts = [remaining_content]
-            else:
-                current_content_parts = []
+            current_content_parts = []
         else:
             # 这是内容段落，添加到当前新闻
             if current_title:
                 # 检查这个段落是否是资料来源
-                if is_source_line(para):
+                if is_source(para):
                     # 如果当前内容为空，暂存资料来源
                     if not current_content_parts:
                         pending_source = para
                     else:
                         # 检查最后一部分是否已经是资料来源
-                        if not is_source_line(current_content_parts[-1]):
+                        if not is_source(current_content_parts[-1]):
                             current_content_parts.append(para)
                 else:
                     current_content_parts.append(para)
@@ -258,53 +257,14 @@ def parse_section_content(section_text, domain_name):
                     current_title = clean_first[:title_end].strip()
                     if len(clean_first) > title_end:
                         remaining = clean_first[title_end:].strip()
-                        if not is_source_line(remaining):
+                        if not is_source(remaining):
                             current_content_parts.append(remaining)
-                    if len(para_lines) > 1:
-                        remaining_lines = '\n'.join(para_lines[1:])
-                        if not is_source_line(remaining_lines):
-                            current_content_parts.append(remaining_lines)
-                        else:
-                            pending_source = remaining_lines
                 else:
                     # 使用第一行作为标题
                     current_title = clean_first
-                    if len(para_lines) > 1:
-                        remaining_lines = '\n'.join(para_lines[1:])
-                        if not is_source_line(remaining_lines):
-                            current_content_parts.append(remaining_lines)
-                        else:
-                            pending_source = remaining_lines
     
     # 保存最后一条新闻
-    if current_title and current_content_parts:
-        content = '\n'.join(current_content_parts).strip()
-        
-        # 检查内容末尾是否已有资料来源
-        if content:
-            content_lines = content.split('\n')
-            has_source_at_end = False
-            if len(content_lines) >= 1:
-                last_few_lines = '\n'.join(content_lines[-3:])
-                if is_source_line(last_few_lines):
-                    has_source_at_end = True
-            
-            # 如果没有资料来源，尝试添加
-            if not has_source_at_end:
-                extracted_source = extract_source_from_text(content)
-                if extracted_source:
-                    content_lines_clean = [line for line in content_lines if not is_source_line(line)]
-                    content = '\n'.join(content_lines_clean).strip()
-                    if content:
-                        content = f"{content}\n{extracted_source}"
-                elif pending_source:
-                    content = f"{content}\n{pending_source}"
-        
-        if content:
-            news_items.append({
-                "title": current_title,
-                "content": content
-            })
+    finalize_news(current_title, current_content_parts)
     
     # 过滤掉明显无效的新闻项，并确保每条新闻的content末尾都有资料来源
     filtered_items = []
@@ -316,7 +276,7 @@ def parse_section_content(section_text, domain_name):
         if (len(title) < 5 or 
             title == content or 
             title.startswith('#') or
-            any(kw in title for kw in ['环境（E）', '社会（S）', '治理（G）', '公司治理']) or
+            any(kw in title for kw in _SECTION_TITLE_KWS) or
             len(content) < 20):  # 内容太短也跳过
             continue
         
@@ -330,28 +290,29 @@ def parse_section_content(section_text, domain_name):
         for line in content_lines:
             line_stripped = line.strip()
             # 去掉行首的 "---" 再判断，并跳过仅由短线/空格组成的行
-            line_no_dash = re.sub(r'^\-+\s*', '', line_stripped)
+            line_no_dash = _LEADING_DASH_RE.sub('', line_stripped)
             if not line_stripped:
                 content_lines_clean.append(line)
-            elif re.match(r'^[\s\-]+$', line_stripped):
+            elif _DASH_ONLY_RE.match(line_stripped):
                 continue
-            elif is_source_line(line_no_dash):
+            elif is_source(line_no_dash):
                 source_lines.append(line_no_dash)
             elif line_no_dash:
                 # 去掉行尾的 "---"，避免正文末尾残留
-                content_lines_clean.append(re.sub(r'\-+\s*$', '', line_no_dash))
+                content_lines_clean.append(_TRAILING_DASH_RE.sub('', line_no_dash))
         
         # 重新组合：先内容，后资料来源（去掉末尾的 ---）
         clean_content = '\n'.join(content_lines_clean).strip()
-        clean_content = re.sub(r'\n?\-+\s*$', '', clean_content).strip()
+        clean_content = _TRAILING_DASH_LINE_RE.sub('', clean_content).strip()
         
         # 格式化资料来源
         formatted_sources = []
-        if source_lines:
-            for source_line in source_lines:
-                formatted = format_source_line(source_line)
-                if formatted and formatted not in formatted_sources:
-                    formatted_sources.append(formatted)
+        seen_sources = set()
+        for source_line in source_lines:
+            formatted = format_source_line(source_line)
+            if formatted and formatted not in seen_sources:
+                seen_sources.add(formatted)
+                formatted_sources.append(formatted)
         
         # 如果没有找到资料来源，尝试从整个文本中提取
         if not formatted_sources:
@@ -386,10 +347,9 @@ def extract_title_and_hotspot(final_report_text, date_info):
     lines = final_report_text.split('\n')
     
     # 查找标题（通常在开头，可能包含日期）
-    for i, line in enumerate(lines[:15]):  # 检查前15行
-        line_stripped = line.strip()
-        # 移除Markdown格式
-        clean_line = line_stripped.replace('#', '').replace('*', '').strip()
+    for line in lines[:15]:  # 检查前15行
+        # 移除Markdown格式（一次 translate 删掉 # 与 *，再去首尾空白）
+        clean_line = line.translate(_MD_MARK_TABLE).strip()
         
         if 'ESG周报' in clean_line or 'ESG投研日报' in clean_line or ('ESG' in clean_line and ('周报' in clean_line or '日报' in clean_line)):
             title = clean_line
@@ -404,9 +364,8 @@ def extract_title_and_hotspot(final_report_text, date_info):
     hotspot_end = None
     
     for i, line in enumerate(lines):
-        line_lower = line.lower()
-        # 查找热点聚焦的开始标记（跳过标题行）
-        if any(keyword in line_lower for keyword in ['热点聚焦', '核心摘要', '摘要', '周报开篇']):
+        # 查找热点聚焦的开始标记（跳过标题行）；关键词均为中文，无需先转小写
+        if any(keyword in line for keyword in _HOTSPOT_KWS):
             # 跳过标题行，找到实际内容开始
             hotspot_start = i + 1
             # 跳过可能的空行和分隔线
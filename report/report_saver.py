@@ -3,10 +3,9 @@
 包含保存原始内容和格式化内容的功能
 """
 import os
-import json
 from datetime import datetime
 from .report_formatter import parse_section_content, extract_title_and_hotspot, normalize_newlines
-from core.utils import safe_print, get_output_subdir, get_output_date_suffix
+from core.utils import safe_print, get_output_subdir, get_output_date_suffix, dump_json
 
 
 def save_raw_content(final_content, hotspot_content, polished_results, date_info):
@@ -17,39 +16,26 @@ def save_raw_content(final_content, hotspot_content, polished_results, date_info
     filename = os.path.join(output_dir, f"{suffix}_原始内容.txt")
 
     report_label = date_info.get("report_label", "ESG投研周报")
-    content_parts = []
-    content_parts.append("=" * 80)
-    content_parts.append(f"{report_label} - 原始内容")
-    content_parts.append(f"研究期间：{date_info['date_range_chinese']}")
-    content_parts.append(f"生成时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}")
-    content_parts.append("=" * 80)
-    content_parts.append("")
-    
-    # 最终合并报告
-    content_parts.append("【最终合并报告】")
-    content_parts.append("-" * 80)
-    content_parts.append(final_content)
-    content_parts.append("")
-    content_parts.append("")
-    
-    # 热点聚焦
-    content_parts.append("【热点聚焦】")
-    content_parts.append("-" * 80)
-    content_parts.append(hotspot_content)
-    content_parts.append("")
-    content_parts.append("")
-    
+    sections = [("最终合并报告", final_content), ("热点聚焦", hotspot_content)]
     # E、S、G章节
     for domain, domain_name in [("E", "环境（E）"), ("S", "社会（S）"), ("G", "公司治理（G）")]:
-        content_parts.append(f"【{domain_name}章节】")
-        content_parts.append("-" * 80)
-        content_parts.append(polished_results.get(domain, "无内容"))
-        content_parts.append("")
-        content_parts.append("")
+        sections.append((f"{domain_name}章节", polished_results.get(domain, "无内容")))
     
-    # 保存文件
+    # 逐段直接写入文件，不再先拼出整份文本（各段正文可能很长）
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(content_parts))
+        f.write("=" * 80 + "\n")
+        f.write(f"{report_label} - 原始内容\n")
+        f.write(f"研究期间：{date_info['date_range_chinese']}\n")
+        f.write(f"生成时间：{datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}\n")
+        f.write("=" * 80 + "\n")
+        for i, (section_name, section_text) in enumerate(sections):
+            # 段与段之间空两行
+            f.write("\n\n" if i else "\n")
+            f.write(f"【{section_name}】\n")
+            f.write("-" * 80 + "\n")
+            f.write(section_text)
+            f.write("\n")
+        f.write("\n")
     
     safe_print(f"\n原始内容已保存至：{filename}")
     return filename
@@ -63,14 +49,15 @@ def save_formatted_report(final_content, hotspot_content, polished_results, date
     filename = os.path.join(output_dir, f"{suffix}_报告.json")
     report_label = date_info.get("report_label", "ESG投研周报")
 
-    title, _ = extract_title_and_hotspot(final_content, date_info)
+    # 标题与热点聚焦一次解析得到，避免对整份报告重复拆行扫描
+    title, report_hotspot = extract_title_and_hotspot(final_content, date_info)
     if not title:
         title = f"{report_label}（{date_info['date_range_chinese']}）"
     
     # 优先使用传入的hotspot_content，如果为空或太短，尝试从final_content中提取
     extracted_hotspot = hotspot_content.strip() if hotspot_content and len(hotspot_content.strip()) > 50 else ""
     if not extracted_hotspot:
-        _, extracted_hotspot = extract_title_and_hotspot(final_content, date_info)
+        extracted_hotspot = report_hotspot
     if not extracted_hotspot or len(extracted_hotspot) < 50:
         extracted_hotspot = hotspot_content  # 最后使用传入的参数
     
@@ -134,9 +121,9 @@ def save_formatted_report(final_content, hotspot_content, polished_results, date
         }
     }
     
-    # 保存为 JSON 文件
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(report_data, f, ensure_ascii=False, indent=2)
+    # 保存为 JSON 文件（2 空格缩进，非 ASCII 不转义）
+    with open(filename, 'wb') as f:
+        f.write(dump_json(report_data, indent=True))
     
     safe_print(f"\n格式化报告已保存至：{filename}")
     return filename
@@ -17,6 +17,8 @@ from flask import Flask, jsonify, render_template, request, send_file
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = PROJECT_ROOT / "output"
+# 下载路径校验用的解析后根目录，导入时解析一次，避免每次请求都走 readlink
+_OUTPUT_DIR_RESOLVED = OUTPUT_DIR.resolve()
 
 # 确保工作目录为项目根（本地或 gunicorn 均生效）
 try:
@@ -25,10 +27,20 @@ except Exception:
     pass
 
 try:
-    from core.utils import get_latest_output_subdir, list_output_files_in_subdir
+    from core.utils import get_latest_output_subdir, list_output_files_in_subdir, load_json
 except ImportError:
     get_latest_output_subdir = None
     list_output_files_in_subdir = None
+    load_json = None
+
+
+def _load_json(path):
+    """读取 JSON 文件（core 可用时走 core.utils.load_json，否则用标准库 json）"""
+    if load_json is not None:
+        return load_json(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50MB
@@ -227,8 +239,7 @@ def _check_config(provider=None, api_key_override=None, api_keys_override=None):
 
     if cfg.exists():
         try:
-            with open(cfg, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = _load_json(cfg)
             gemini_block = data.get("gemini") if isinstance(data.get("gemini"), dict) else {}
             qwen_block = data.get("qwen") if isinstance(data.get("qwen"), dict) else {}
             api_key = data.get("api_key") or gemini_block.get("api_key") or (data.get("api_keys") or gemini_block.get("api_keys") or {}).get("E")
@@ -275,8 +286,7 @@ def _read_progress(job_id):
     try:
         progress_file = (OUTPUT_DIR / job_id / ".progress.json") if job_id else (OUTPUT_DIR / ".progress.json")
         if progress_file.exists():
-            with open(progress_file, "r", encoding="utf-8") as f:
-                progress = json.load(f)
+            progress = _load_json(progress_file)
             with _jobs_lock:
                 j = _jobs.get(job_id)
                 if j and j.get("status") == "idle":
@@ -389,7 +399,7 @@ def api_download(filename):
         return "Invalid path", 400
     path = (OUTPUT_DIR / filename).resolve()
     try:
-        path.relative_to(OUTPUT_DIR.resolve())
+        path.relative_to(_OUTPUT_DIR_RESOLVED)
     except ValueError:
         return "Invalid path", 400
     if not path.exists() or not path.is_file():